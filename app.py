@@ -1,8 +1,12 @@
 # app.py
 import streamlit as st
 from src import data_manager, llm_interaction, config # Your existing modules
+from src import hot # Pure helpers on the per-turn path; optionally compiled with mypyc
+from src import semantic_cache
 import json
-# from datetime import datetime # Not directly used in this version's forms
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -12,54 +16,123 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# --- Helper Functions (Keep your existing format_entry_for_display) ---
-def format_entry_for_display(entry):
-    display_parts = [
+# --- Helper Functions (route_to_expert lives in src/hot.py) ---
+CHAT_RENDER_WINDOW = 20 # Number of most recent chat turns rendered on each rerun
+
+def render_chat_turn(user_msg, ai_msg_obj):
+    with st.chat_message("user", avatar="🧑‍💻"):
+        st.write(user_msg)
+    if ai_msg_obj: # Check if AI response exists
+        ai_response_text, expert_used = ai_msg_obj # Unpack
+        with st.chat_message("assistant", avatar="🤖"):
+            st.write(ai_response_text)
+            st.caption(f"💡 Answered using {expert_used.replace('_', ' ').title()}") # Optional: show expert
+
+def trim_chat_history():
+    """Keeps chat_history bounded: once it exceeds the cap, the oldest turns are appended to a JSONL archive."""
+    chat_history = st.session_state.chat_history
+    if len(chat_history) <= config.MAX_CHAT_HISTORY_TURNS:
+        return
+    evicted_turns = chat_history[:-config.CHAT_HISTORY_TRIM_TO]
+    del chat_history[:-config.CHAT_HISTORY_TRIM_TO]
+    archive_path = os.path.join(config.ARCHIVE_DIR, f"chat-{datetime.now(timezone.utc).strftime('%Y-%m-%d')}.jsonl")
+    try:
+        os.makedirs(config.ARCHIVE_DIR, exist_ok=True)
+        with open(archive_path, 'a', encoding='utf-8') as f:
+            for user_msg, ai_msg_obj in evicted_turns:
+                ai_response_text, expert_used = ai_msg_obj if ai_msg_obj else (None, None)
+                f.write(json.dumps({"user": user_msg, "assistant": ai_response_text, "expert": expert_used}) + '\n')
+    except OSError as e:
+        print(f"Error archiving {len(evicted_turns)} chat turns to {archive_path}: {e}")
+
+@st.cache_data(max_entries=4096, show_spinner=False)
+def render_entry_markdown(entry_id, _entry):
+    """
+    Full View Log Entries markdown for one entry, memoized by entry_id.
+    Entries are immutable once written, so the rendered block never goes stale.
+    """
+    entry = _entry
+    md_parts = [
         f"**ID:** `{entry.get('entry_id', 'N/A')}`",
         f"**Timestamp:** {entry.get('timestamp_utc', 'N/A')}",
         f"**Type:** {entry.get('entry_type', 'N/A')}",
-        f"**Primary Emotion:** {entry.get('primary_emotion', 'N/A')}"
+        f"**Primary Emotion:** {entry.get('primary_emotion', 'N/A')}",
+        f"**Tags:** {', '.join(entry.get('tags') or ['N/A'])}",
+        "---",
+        f"**Situation / Summary:**\n{(entry.get('trigger_event') or {}).get('summary') or 'N/A'}",
     ]
-    summary = entry.get("trigger_event", {}).get("summary", "No summary.")
-    display_parts.append(f"**Summary:** {summary[:100]}{'...' if len(summary) > 100 else ''}")
-    return "\n\n".join(display_parts)
+    if entry.get("my_thoughts_during"):
+        md_parts.append("**My Thoughts:**")
+        md_parts.append("\n".join(f"- {thought}" for thought in entry.get("my_thoughts_during")))
+    if (entry.get("reflection_learnings") or {}).get("insights_gained"):
+        md_parts.append("**Learnings / Insights:**")
+        md_parts.append("\n".join(f"- {insight}" for insight in entry.get("reflection_learnings").get("insights_gained")))
+    if entry.get("notes_details"):
+        md_parts.append(f"**Detailed Notes:**\n{entry.get('notes_details')}")
+    return "\n\n".join(md_parts)
+
+def build_fallback_context(max_entries):
+    """Context string from the most recent entries, used when RAG has nothing."""
+    # Only the newest max_entries lines are read; _fallback_line is precomputed by data_manager
+    return hot.join_fallback_lines(data_manager.get_recent_entries(0, max_entries))
 
 # --- NEW: Expert Router Function ---
-def route_to_expert(user_query: str) -> str:
+route_to_expert = hot.route_to_expert
+
+# RAG metadata filter per expert (shared with the CLI)
+EXPERT_RAG_FILTERS = hot.EXPERT_RAG_FILTERS
+
+# --- Cached Bootstraps (shared across sessions and reruns) ---
+@st.cache_data(show_spinner=False)
+def load_entries_cached(data_file_mtime, max_entries=None):
     """
-    Determines which expert should handle the query based on keywords.
-    Returns the expert_type string.
+    Parsed JSONL entries, newest first; the file mtime is the cache key so appends invalidate it.
+    Newest first is reversed file order, the same "most recent" as the View pager and the chat fallback.
     """
-    query_lower = user_query.lower()
-    # More specific keywords first
-    if any(keyword in query_lower for keyword in ["academic", "study", "studies", "exam", "marks", "remedial", "os subject", "subject"]):
-        return "academic_advisor_expert" # New expert for your data
-    elif any(keyword in query_lower for keyword in ["girlfriend", "relationship", "conflict with", "argument with"]):
-        return "relationship_counselor_expert" # New expert
-    elif any(keyword in query_lower for keyword in ["feel", "feeling", "emotion", "sad", "happy", "anxious", "stressed", "joyful", "disappointed"]):
-        return "emotion_reflection_expert"
-    elif any(keyword in query_lower for keyword in ["problem", "solve", "issue", "task", "how to", "strategy", "difficult", "time management", "balance"]):
-        # "time management" and "balance" are good candidates for problem solving
-        return "problem_solving_expert"
-    elif any(keyword in query_lower for keyword in ["trip", "travel", "friends", "flatmates", "waterpark", "cricket", "hobby", "sport"]):
-        return "leisure_activity_expert" # New expert for positive events
-    else:
-        return "general_assistant" # Default
+    entries = data_manager.load_data(max_entries=max_entries)
+    entries.reverse()
+    return entries
+
+@st.cache_resource(show_spinner=False)
+def get_rag_collection():
+    """Opens the Chroma collection once per process. Cheap: the embedding model is not loaded here."""
+    data_manager.initialize_vector_store_if_needed()
+    return data_manager.vector_collection_instance
+
+@st.cache_resource(show_spinner="Loading the embedding model...")
+def get_embedder():
+    """Loads the embedding model on the first chat turn that needs RAG, not at app startup."""
+    data_manager.initialize_rag_if_needed()
+    return data_manager.embedding_model_instance
+
+@st.cache_data(show_spinner=False)
+def build_search_index_cached(_sorted_entries, data_file_mtime, max_entries=None):
+    """
+    Search structures for the View tab's sorted entry list: the inverted index, the column-wise view
+    (search blobs etc.) and entry_id -> position for O(1) hydration in recency order.
+    Keyed like load_entries_cached (the list itself is not hashed).
+    """
+    log_columns = data_manager.build_log_columns(_sorted_entries)
+    position_by_id = {entry_id: position for position, entry_id in enumerate(log_columns["ids"])}
+    return data_manager.build_search_index(_sorted_entries), log_columns, position_by_id
 
 # --- Initialize Session State ---
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = [] # Will store tuples: (user_msg, (ai_response_text, expert_used))
 
-if 'all_entries' not in st.session_state:
-    st.session_state.all_entries = data_manager.load_data()
-    st.toast(f"Loaded {len(st.session_state.all_entries)} entries from JSONL.")
-
-if 'rag_initialized_dm' not in st.session_state:
-    with st.spinner("Initializing AI Core and RAG components..."):
-        st.session_state.rag_initialized_dm = data_manager.initialize_rag_if_needed()
-    if st.session_state.rag_initialized_dm:
-        st.toast("RAG components initialized successfully!", icon="✅")
-    else:
+# Entries are paged from disk on demand (data_manager.get_recent_entries); only the search path loads the full list.
+total_entries = data_manager.count_entries()
+if 'entries_loaded_toast_shown' not in st.session_state:
+    st.session_state.entries_loaded_toast_shown = True
+    st.toast(f"Found {total_entries} entries in JSONL.")
+
+rag_collection = get_rag_collection()
+rag_ready = rag_collection is not None # The embedder is loaded lazily by get_embedder()
+if 'rag_status_shown' not in st.session_state:
+    st.session_state.rag_status_shown = True
+    if rag_ready:
+        st.toast("RAG index opened successfully!", icon="✅")
+    elif data_manager.RAG_ENABLED:
         st.error("Failed to initialize RAG components. RAG features may be limited or disabled.")
 
 
@@ -72,11 +145,22 @@ app_mode = st.sidebar.radio(
     key="app_mode_selector"
 )
 st.sidebar.markdown("---")
-st.sidebar.info(f"Total Log Entries: {len(st.session_state.all_entries)}")
-if data_manager.RAG_ENABLED and st.session_state.get('rag_initialized_dm'):
+st.sidebar.info(f"Total Log Entries: {total_entries}")
+if data_manager.RAG_ENABLED and rag_ready:
     try:
-        if data_manager.vector_collection_instance:
-            st.sidebar.info(f"RAG Index Size: {data_manager.vector_collection_instance.count()} chunks")
+        if rag_collection:
+            # count() is a Chroma round-trip: it runs once per session (or on request); chunks indexed since then
+            # are added from data_manager's in-process counter
+            if 'rag_count' not in st.session_state or st.sidebar.button("Refresh index size"):
+                st.session_state.rag_count = rag_collection.count()
+                st.session_state.rag_count_indexed_mark = data_manager.get_indexed_chunk_total()
+            rag_count = st.session_state.rag_count + data_manager.get_indexed_chunk_total() - st.session_state.rag_count_indexed_mark
+            st.sidebar.info(f"RAG Index Size: {rag_count} chunks")
+            pending_index_count = data_manager.get_pending_index_count()
+            if pending_index_count:
+                st.sidebar.caption(f"⏳ {pending_index_count} new entr{'y' if pending_index_count == 1 else 'ies'} still being indexed")
+            collection_metadata = rag_collection.metadata or {}
+            st.sidebar.caption(f"HNSW: space={collection_metadata.get('hnsw:space', 'l2')}, M={collection_metadata.get('hnsw:M', 'default')}, search_ef={collection_metadata.get('hnsw:search_ef', 'default')}")
         else:
             st.sidebar.warning("RAG collection not ready.")
     except Exception as e:
@@ -84,113 +168,170 @@ if data_manager.RAG_ENABLED and st.session_state.get('rag_initialized_dm'):
 else:
     st.sidebar.warning("RAG is disabled or not initialized.")
 
-# --- Main App Logic ---
-
-if app_mode == "Chat with AI":
+# --- Panels ---
+# Chat and View run as fragments: typing a message or a search term re-runs only that panel,
+# not the sidebar, the bootstrap checks or the other tabs. Fragments may not write to the sidebar.
+@st.fragment
+def chat_panel():
     st.header("💬 Chat with Your Personal AI")
     st.markdown("Ask for advice, reflections, or guidance based on your logs.")
 
-    # Display chat history
-    for user_msg, ai_msg_obj in st.session_state.chat_history:
-        with st.chat_message("user", avatar="🧑‍💻"):
-            st.write(user_msg)
-        if ai_msg_obj: # Check if AI response exists
-            ai_response_text, expert_used = ai_msg_obj # Unpack
-            with st.chat_message("assistant", avatar="🤖"):
-                st.write(ai_response_text)
-                st.caption(f"💡 Answered using {expert_used.replace('_', ' ').title()}") # Optional: show expert
+    # Display chat history: only the last CHAT_RENDER_WINDOW turns are rendered on every rerun.
+    # The full list stays in session state; older turns are rendered only when explicitly requested.
+    chat_history = st.session_state.chat_history
+    earlier_turns = chat_history[:-CHAT_RENDER_WINDOW]
+    if earlier_turns:
+        with st.expander(f"Earlier messages ({len(earlier_turns)})", expanded=False):
+            if st.checkbox("Load earlier messages", key="load_earlier_messages"):
+                for user_msg, ai_msg_obj in earlier_turns:
+                    render_chat_turn(user_msg, ai_msg_obj)
+    for user_msg, ai_msg_obj in chat_history[-CHAT_RENDER_WINDOW:]:
+        render_chat_turn(user_msg, ai_msg_obj)
 
     user_query = st.chat_input("What's on your mind, or what can I help you reflect on?")
 
     if user_query:
-        st.session_state.chat_history.append((user_query, None)) # Placeholder for AI response tuple
-        st.rerun()
-
-    # Process the latest user query if AI response is None
-    if st.session_state.chat_history and st.session_state.chat_history[-1][1] is None:
-        last_user_query = st.session_state.chat_history[-1][0]
+        # One script pass per turn: echo the user bubble inline and stream the reply, no st.rerun() round-trips
+        last_user_query = user_query
+        with st.chat_message("user", avatar="🧑‍💻"):
+            st.write(last_user_query)
         with st.chat_message("assistant", avatar="🤖"):
-            with st.spinner("Selecting expert, searching logs, and thinking..."): # Updated spinner message
+            with st.spinner("Selecting expert and searching logs..."): # Updated spinner message
                 
                 # --- 1. ROUTE TO EXPERT ---
                 chosen_expert = route_to_expert(last_user_query)
-                st.sidebar.info(f"Expert routing: {chosen_expert.replace('_', ' ').title()}") # Display chosen expert
+                st.caption(f"Expert routing: {chosen_expert.replace('_', ' ').title()}") # Display chosen expert
 
                 # --- 2. PREPARE RAG FILTER BASED ON EXPERT ---
                 context_string = ""
                 retrieved_chunks_for_display = []
-                rag_filter = None # Default: no specific filter
-
-                # Your data has rich entry_type, let's use them!
-                if chosen_expert == "emotion_reflection_expert":
-                    # Broaden for emotion: any entry with a primary emotion or specific conflict types
-                    # This requires ChromaDB $or and $ne capabilities in filter_metadata if you want to combine.
-                    # For simplicity now, let's pick one or allow a list if your data_manager handles it.
-                    # Assuming your data_manager.query_relevant_log_chunks can handle simple {"key": "value"}
-                    # or you enhance it for {"$or": [{"key1":"val1"}, {"key2":"val2"}]}
-                    rag_filter = {"entry_type": "emotion_log"} # Defaulting to this, but your data suggests more
-                    # For your data, "interpersonal_conflict" and "academic_setback" also carry strong emotions.
-                elif chosen_expert == "academic_advisor_expert":
-                    rag_filter = {"entry_type": "academic_setback"}
-                elif chosen_expert == "relationship_counselor_expert":
-                    rag_filter = {"entry_type": "interpersonal_conflict"}
-                elif chosen_expert == "problem_solving_expert":
-                    # Could be general, or filter for specific types if you create them
-                    # For now, let's assume it might also look at conflicts or academic issues as problems
-                    pass # No specific filter, will rely on semantic search across all types
-                elif chosen_expert == "leisure_activity_expert":
-                    rag_filter = {"$or": [ # Example of an OR condition if your ChromaDB setup supports it
-                        {"entry_type": "social_event_travel"},
-                        {"entry_type": "recreational_activity"},
-                        {"entry_type": "hobby_sport"}
-                    ]}
-                    # If not, pick one or make query_relevant_log_chunks handle a list of types
-                    # For simplicity if $or isn't set up:
-                    # rag_filter = {"entry_type": "social_event_travel"} # or another relevant one
-
-                st.sidebar.caption(f"RAG filter: {rag_filter if rag_filter else 'None (general search)'}")
+                rag_filter = EXPERT_RAG_FILTERS.get(chosen_expert) # None: no specific filter, semantic search across all types
+
+                st.caption(f"RAG filter: {rag_filter if rag_filter else 'None (general search)'}")
+
+                # --- 2b. SEMANTIC CACHE: a rephrasing of an earlier question, same expert, unchanged log ---
+                # The query embedding is computed once here and reused by the RAG search below.
+                rag_available = data_manager.RAG_ENABLED and rag_ready and get_embedder() is not None
+                query_embedding = data_manager.embed_query(last_user_query) if rag_available else None
+                cached_response = semantic_cache.lookup(last_user_query, chosen_expert, rag_filter, query_embedding=query_embedding) if query_embedding is not None else None
+                if cached_response is not None: # No retrieval, no LLM call
+                    st.caption("Answered from an earlier, similar question (no new entries since).")
+                    st.write(cached_response)
+                    st.session_state.chat_history.append((last_user_query, (cached_response, chosen_expert)))
+                    trim_chat_history()
+                    return
 
                 # --- 3. GET CONTEXT (RAG or Fallback) ---
-                if data_manager.RAG_ENABLED and st.session_state.get('rag_initialized_dm'):
-                    retrieved_chunks = data_manager.query_relevant_log_chunks(
+                # The RAG query and the recent-entries fallback are independent, so they run concurrently;
+                # Streamlit calls stay on this thread. The one-time LLM connection warmup (first turn only) runs alongside and is not waited for.
+                llm_interaction.start_warmup()
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    fallback_future = executor.submit(build_fallback_context, config.MAX_CONTEXT_ENTRIES_FOR_LLM)
+                    rag_future = executor.submit(
+                        data_manager.query_relevant_log_chunks,
                         last_user_query, 
                         n_results=config.MAX_CONTEXT_ENTRIES_FOR_LLM,
-                        filter_metadata=rag_filter # Pass the expert-specific filter
-                    )
+                        filter_metadata=rag_filter, # Pass the expert-specific filter
+                        with_metadata=True,
+                        max_tokens=config.MAX_CONTEXT_TOKENS,
+                        query_embedding=query_embedding
+                    ) if rag_available else None
+                    retrieved_chunks = rag_future.result() if rag_future else []
+
                     if retrieved_chunks:
-                        context_string = "\n\n---\n\n".join(retrieved_chunks)
+                        context_string = "\n\n---\n\n".join(chunk for chunk, _ in retrieved_chunks)
                         retrieved_chunks_for_display = retrieved_chunks
-                    else:
-                        st.sidebar.caption(f"RAG: No specific chunks found for '{chosen_expert}' with filter.")
-                else: 
-                    st.sidebar.warning("RAG disabled/failed. Using recent entries as fallback context.")
-
-                if not context_string: # Fallback if RAG found nothing or is disabled
-                    st.sidebar.caption("Using recent entries as general context for fallback.")
-                    sorted_entries = sorted(st.session_state.all_entries, key=lambda x: x.get("timestamp_utc", ""), reverse=True)
-                    context_entries_for_prompt = sorted_entries[:config.MAX_CONTEXT_ENTRIES_FOR_LLM]
-                    context_string = "\n\n---\n\n".join([
-                        f"Entry ID: {e.get('entry_id')}, Type: {e.get('entry_type')}, Emotion: {e.get('primary_emotion','N/A')}, Summary: {e.get('trigger_event',{}).get('summary','N/A')}, Learnings: {'. '.join(e.get('reflection_learnings',{}).get('insights_gained',[]))}"
-                        for e in context_entries_for_prompt
-                    ])
-
-                if retrieved_chunks_for_display:
-                    with st.expander("ℹ️ View Retrieved Context (from RAG)", expanded=False):
-                        for i, chunk in enumerate(retrieved_chunks_for_display):
-                            st.caption(f"Chunk {i+1}:")
-                            st.markdown(f"> {chunk}")
-
-                # --- 4. CALL LLM WITH CHOSEN EXPERT AND CONTEXT ---
-                ai_response_text = llm_interaction.get_ai_response(
+                    elif rag_available:
+                        st.caption(f"RAG: No specific chunks found for '{chosen_expert}' with filter.")
+                    else: 
+                        st.warning("RAG disabled/failed. Using recent entries as fallback context.")
+
+                    if not context_string: # Fallback if RAG found nothing or is disabled
+                        st.caption("Using recent entries as general context for fallback.")
+                        context_string = fallback_future.result()
+
+            if retrieved_chunks_for_display:
+                with st.expander("ℹ️ View Retrieved Context (from RAG)", expanded=False):
+                    for i, (chunk, chunk_metadata) in enumerate(retrieved_chunks_for_display):
+                        # Source details come from the vector-search response itself, no lookup in the log
+                        st.caption(f"Chunk {i+1} · {chunk_metadata.get('entry_type', 'unknown').replace('_', ' ')} · {chunk_metadata.get('timestamp_utc', 'N/A')[:10]}:")
+                        st.markdown(f"> {chunk}")
+
+            # --- 4. GET LLM RESPONSE WITH CHOSEN EXPERT AND CONTEXT ---
+            response_status = {} # "complete": a finished answer, not an error or a stream cut off midway
+            if config.STREAMING_ENABLED: # Paint from the first token instead of after the whole generation
+                ai_response_text = st.write_stream(llm_interaction.stream_ai_response(
                     last_user_query, 
                     context_string, 
-                    expert_type=chosen_expert # Pass the chosen expert
-                )
-                
+                    expert_type=chosen_expert, # Pass the chosen expert
+                    status=response_status
+                ))
+            else:
+                with st.spinner(f"Consulting {chosen_expert.replace('_', ' ').title()}..."):
+                    ai_response_text = llm_interaction.get_ai_response(
+                        last_user_query, 
+                        context_string, 
+                        expert_type=chosen_expert,
+                        status=response_status
+                    )
                 st.write(ai_response_text)
-                # Update chat history with the AI response and the expert that handled it
-                st.session_state.chat_history[-1] = (last_user_query, (ai_response_text, chosen_expert))
-                st.rerun() # Rerun to update the display with the AI's message
+            st.caption(f"💡 Answered using {chosen_expert.replace('_', ' ').title()}")
+            if response_status.get("complete"):
+                semantic_cache.store(last_user_query, chosen_expert, rag_filter, ai_response_text, query_embedding=query_embedding)
+
+        # Store the finished turn with the expert that handled it; the next rerun renders it from history
+        st.session_state.chat_history.append((last_user_query, (ai_response_text, chosen_expert)))
+        trim_chat_history()
+
+@st.fragment
+def view_panel():
+    # No changes needed here unless you want to display expert-specific views
+    # The existing search should work fine.
+    st.header("📖 View Your Log Entries")
+    # ... (your existing code for View Log Entries) ...
+    if not total_entries:
+        st.warning("No entries yet. Add some first from the 'Add New Log Entry' section!")
+    else:
+        col1, col2 = st.columns([3,1])
+        with col1:
+            search_term = st.text_input("Search entries (searches summaries, thoughts, learnings, tags):", placeholder="e.g., anxious, project deadline, girlfriend")
+        with col2:
+            num_entries_to_show = st.number_input("Max entries to display:", min_value=1, max_value=total_entries, value=min(10, total_entries))
+
+        if not search_term:
+            # Plain browsing only needs the visible page
+            filtered_entries = data_manager.get_recent_entries(0, num_entries_to_show)
+        else:
+            # Search needs the (cached, newest-first) entry list; capped unless the user asks for everything
+            search_max_entries = config.MAX_ENTRIES_IN_MEMORY
+            if total_entries > config.MAX_ENTRIES_IN_MEMORY:
+                if st.checkbox("Search older entries too", help=f"By default only the most recent {config.MAX_ENTRIES_IN_MEMORY} entries are searched."):
+                    search_max_entries = None
+            sorted_entries = load_entries_cached(data_manager.get_data_file_mtime(), search_max_entries)
+            search_index, log_columns, position_by_id = build_search_index_cached(sorted_entries, data_manager.get_data_file_mtime(), search_max_entries)
+            # Same matching as a plain case-insensitive substring scan; the index only narrows the entries scanned
+            search_term_folded = search_term.casefold()
+            candidate_tokens = data_manager.search_candidate_tokens(search_term)
+            if candidate_tokens:
+                candidate_ids = set.intersection(*(search_index.get(token, set()) for token in candidate_tokens))
+                candidate_positions = sorted(position_by_id[entry_id] for entry_id in candidate_ids)
+            else: # No word is guaranteed whole (e.g. one- or two-word terms): every entry is a candidate
+                candidate_positions = range(len(sorted_entries))
+            search_blobs = log_columns["search_blobs"]
+            filtered_entries = [sorted_entries[position] for position in candidate_positions if search_term_folded in search_blobs[position]]
+            st.caption(f"Found {len(filtered_entries)} entries matching '{search_term}'.")
+
+        if not filtered_entries:
+            st.info("No entries match your current search criteria or no entries exist.")
+        else:
+            for entry in filtered_entries[:num_entries_to_show]:
+                with st.expander(f"{entry.get('entry_type', 'Entry').replace('_',' ').title()}: {entry.get('trigger_event',{}).get('summary', 'No Summary')[:60]}... ({entry.get('timestamp_utc', 'N/A')[:10]})"):
+                    st.markdown(render_entry_markdown(entry.get('entry_id'), entry))
+
+# --- Main App Logic ---
+
+if app_mode == "Chat with AI":
+    chat_panel()
 
 
 elif app_mode == "Add New Log Entry":
@@ -267,7 +408,6 @@ elif app_mode == "Add New Log Entry":
                 # The first argument to add_entry is the crucial 'entry_type' for RAG filtering
                 new_entry = data_manager.add_entry(entry_type, data_to_log)
                 if new_entry:
-                    st.session_state.all_entries.append(new_entry)
                     st.success(f"{entry_type.replace('_', ' ').title()} added successfully!")
                     st.balloons()
                 else:
@@ -275,53 +415,7 @@ elif app_mode == "Add New Log Entry":
 
 
 elif app_mode == "View Log Entries":
-    # No changes needed here unless you want to display expert-specific views
-    # The existing search should work fine.
-    st.header("📖 View Your Log Entries")
-    # ... (your existing code for View Log Entries) ...
-    if not st.session_state.all_entries:
-        st.warning("No entries yet. Add some first from the 'Add New Log Entry' section!")
-    else:
-        col1, col2 = st.columns([3,1])
-        with col1:
-            search_term = st.text_input("Search entries (searches summaries, thoughts, learnings, tags):", placeholder="e.g., anxious, project deadline, girlfriend")
-        with col2:
-            num_entries_to_show = st.number_input("Max entries to display:", min_value=1, max_value=len(st.session_state.all_entries), value=min(10, len(st.session_state.all_entries)))
-
-        sorted_entries = sorted(st.session_state.all_entries, key=lambda x: x.get("timestamp_utc", ""), reverse=True)
-        
-        filtered_entries = sorted_entries
-        if search_term:
-            search_term_lower = search_term.lower()
-            filtered_entries = [
-                entry for entry in sorted_entries if
-                search_term_lower in entry.get("trigger_event", {}).get("summary", "").lower() or
-                any(search_term_lower in thought.lower() for thought in entry.get("my_thoughts_during", [])) or
-                any(search_term_lower in insight.lower() for insight in entry.get("reflection_learnings", {}).get("insights_gained", [])) or
-                any(search_term_lower in tag.lower() for tag in entry.get("tags", []))
-            ]
-            st.caption(f"Found {len(filtered_entries)} entries matching '{search_term}'.")
-
-        if not filtered_entries:
-            st.info("No entries match your current search criteria or no entries exist.")
-        else:
-            for entry in filtered_entries[:num_entries_to_show]:
-                with st.expander(f"{entry.get('entry_type', 'Entry').replace('_',' ').title()}: {entry.get('trigger_event',{}).get('summary', 'No Summary')[:60]}... ({entry.get('timestamp_utc', 'N/A')[:10]})"):
-                    st.markdown(f"**ID:** `{entry.get('entry_id', 'N/A')}`")
-                    st.markdown(f"**Timestamp:** {entry.get('timestamp_utc', 'N/A')}")
-                    st.markdown(f"**Type:** {entry.get('entry_type', 'N/A')}")
-                    st.markdown(f"**Primary Emotion:** {entry.get('primary_emotion', 'N/A')}")
-                    st.markdown(f"**Tags:** {', '.join(entry.get('tags', ['N/A']))}")
-                    st.markdown("---")
-                    st.markdown(f"**Situation / Summary:**\n{entry.get('trigger_event', {}).get('summary', 'N/A')}")
-                    if entry.get("my_thoughts_during"):
-                        st.markdown(f"**My Thoughts:**")
-                        for thought in entry.get("my_thoughts_during"): st.markdown(f"- {thought}")
-                    if entry.get("reflection_learnings", {}).get("insights_gained"):
-                        st.markdown(f"**Learnings / Insights:**")
-                        for insight in entry.get("reflection_learnings").get("insights_gained"): st.markdown(f"- {insight}")
-                    if entry.get("notes_details"):
-                         st.markdown(f"**Detailed Notes:**\n{entry.get('notes_details')}")
+    view_panel()
 
 
 # --- Optional: Footer ---
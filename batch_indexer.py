@@ -1,10 +1,12 @@
 # run_batch_indexer.py
+import sys
 from src.data_manager import batch_index_all_logs, initialize_rag_if_needed
 
 if __name__ == "__main__":
     print("Starting batch indexing process...")
     if initialize_rag_if_needed(): # Ensure components are ready
-         batch_index_all_logs()
+         # --force: re-embed chunks that are already indexed; --rebuild: re-create the collection with the current HNSW settings first
+         batch_index_all_logs(force="--force" in sys.argv[1:], rebuild="--rebuild" in sys.argv[1:])
     else:
         print("Could not initialize RAG components. Batch indexing aborted.")
     print("Batch indexing process finished.")
\ No newline at end of file
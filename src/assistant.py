@@ -4,9 +4,63 @@ from . import llm_interaction
 from . import config 
 from . import task_manager
 from . import scheduler_service
+from . import hot
+from . import semantic_cache
+import atexit
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 
+try:
+    import readline # Optional (not on Windows): line editing and history for every input() prompt
+    READLINE_AVAILABLE = True
+except ImportError:
+    READLINE_AVAILABLE = False
+
+CLI_HISTORY_PATH = os.path.expanduser("~/.mymind_history")
+CLI_HISTORY_LENGTH = 1000
+
+def _enable_input_history():
+    """Loads the prompt history and saves it again at exit; input() picks readline up automatically once imported."""
+    if not READLINE_AVAILABLE:
+        return
+    try:
+        readline.read_history_file(CLI_HISTORY_PATH)
+    except OSError: # First run: no history yet
+        pass
+    readline.set_history_length(CLI_HISTORY_LENGTH)
+    atexit.register(readline.write_history_file, CLI_HISTORY_PATH)
+
+try:
+    import dateparser # Optional: natural-language due dates ("tomorrow 3pm")
+    DATEPARSER_AVAILABLE = True
+except ImportError:
+    DATEPARSER_AVAILABLE = False
+
+# Due-date formats accepted by the CLI after ISO 8601, tried in order; naive input is local time
+_TASK_DT_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S")
+
+def _parse_due(due_str):
+    """Parses a CLI due date into a UTC ISO string, or returns None if it can't be understood."""
+    dt_obj = None
+    try: # ISO 8601, including a 'Z' suffix, offsets and fractional seconds ("2025-12-31T14:30:00Z")
+        dt_obj = datetime.fromisoformat(due_str[:-1] + "+00:00" if due_str.endswith("Z") else due_str)
+    except ValueError:
+        pass
+    for fmt in _TASK_DT_FORMATS if dt_obj is None else ():
+        try:
+            dt_obj = datetime.strptime(due_str, fmt)
+            break
+        except ValueError:
+            continue
+    if dt_obj is None and DATEPARSER_AVAILABLE:
+        dt_obj = dateparser.parse(due_str, settings={"RETURN_AS_TIMEZONE_AWARE": True, "PREFER_DATES_FROM": "future"})
+    if dt_obj is None:
+        return None
+    # Naive datetimes are taken as local system time
+    return dt_obj.astimezone(timezone.utc).isoformat()
+
 # --- Helper for Interactive Entry (Updated to align with new entry_types) ---
 def add_log_entry_interactive_cli(entry_type_default="general_note"):
     """Collects data for a log entry interactively via CLI."""
@@ -77,30 +131,15 @@ def add_task_interactive_cli():
     
     description = input("Description (optional): ").strip()
     
-    due_date_str_input = input("Due date (e.g., YYYY-MM-DD HH:MM, or 'tomorrow 3pm', 'next monday 10am', optional): ").strip()
+    due_date_str_input = input("Due date (e.g., YYYY-MM-DD HH:MM" + (", or 'tomorrow 3pm', 'next monday 10am'" if DATEPARSER_AVAILABLE else "") + ", optional): ").strip()
     due_at_utc_iso = None
     if due_date_str_input:
-        # Basic parsing for demonstration. For robust parsing, use libraries like 'dateparser' or 'maya'.
-        # This is a very simplified parser.
-        try:
-            # Attempt direct ISO parsing first if user enters full YYYY-MM-DDTHH:MM:SS
-            if 'T' in due_date_str_input:
-                 dt_obj_naive = datetime.fromisoformat(due_date_str_input)
-            else: # Assume YYYY-MM-DD HH:MM
-                 dt_obj_naive = datetime.strptime(due_date_str_input, "%Y-%m-%d %H:%M")
-            # Assume local timezone input, then convert to UTC
-            # For simplicity, assuming naive datetime is local, then convert to UTC
-            # A better approach would be to ask for timezone or use a library
-            dt_obj_local = dt_obj_naive.astimezone(None) # Make it aware of local system timezone
-            dt_obj_utc = dt_obj_local.astimezone(timezone.utc)
-            due_at_utc_iso = dt_obj_utc.isoformat()
+        due_at_utc_iso = _parse_due(due_date_str_input)
+        if due_at_utc_iso:
             print(f"Parsed due date as UTC: {due_at_utc_iso}")
-        except ValueError:
-            # Add more parsing logic here for "tomorrow 3pm", "next monday" etc.
-            # For now, just inform and skip if complex.
+        else:
             print(f"Could not parse '{due_date_str_input}' into a specific datetime. Due date not set for now.")
-            print("You can update it later or use YYYY-MM-DD HH:MM format.")
-
+            print("You can update it later or use YYYY-MM-DD HH:MM format." + ("" if DATEPARSER_AVAILABLE else " (Install 'dateparser' for inputs like 'tomorrow 3pm'.)"))
 
     priority_input = input("Priority (high, medium, low - default: medium): ").strip().lower()
     priority = priority_input if priority_input in ["high", "medium", "low"] else "medium"
@@ -176,34 +215,27 @@ def mark_task_complete_cli():
 
 # --- CLI Expert Router ---
 def route_to_expert_cli(user_query: str):
-    # Uses the same logic as app.py's router for consistency
-    query_lower = user_query.lower()
-    if any(keyword in query_lower for keyword in ["academic", "study", "studies", "exam", "marks", "remedial", "os subject", "subject"]):
-        return "academic_advisor_expert"
-    elif any(keyword in query_lower for keyword in ["girlfriend", "relationship", "conflict with", "argument with"]):
-        return "relationship_counselor_expert"
-    elif any(keyword in query_lower for keyword in ["feel", "feeling", "emotion", "sad", "happy", "anxious", "stressed", "joyful", "disappointed"]):
-        return "emotion_reflection_expert"
-    elif any(keyword in query_lower for keyword in ["problem", "solve", "issue", "task", "how to", "strategy", "difficult", "time management", "balance"]):
-        return "problem_solving_expert"
-    elif any(keyword in query_lower for keyword in ["trip", "travel", "friends", "flatmates", "waterpark", "cricket", "hobby", "sport"]):
-        return "leisure_activity_expert"
-    else:
-        return "general_assistant"
+    # Same router as app.py (see hot.route_to_expert)
+    return hot.route_to_expert(user_query)
 
 # --- Main Assistant Logic ---
 def run_assistant():
     print("Welcome to MyMind AI - Your Personal AI Assistant (CLI V4 - With Tasks)")
+    _enable_input_history()
     
     # --- Initialize services ---
-    if not data_manager.initialize_rag_if_needed():
-        print("WARNING: RAG components could not be initialized. Contextual advice might be limited.")
+    # The embedding model and Chroma load in the background while the menu is shown; any data_manager call that
+    # needs them waits for this load (initialize_rag_if_needed is lock-protected) instead of starting another one.
+    rag_init_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-init")
+    rag_init_executor.submit(data_manager.initialize_rag_if_needed).add_done_callback(
+        lambda rag_future: rag_future.result() or print("\nWARNING: RAG components could not be initialized. Contextual advice might be limited."))
+    rag_init_executor.shutdown(wait=False)
     
     scheduler_service.start_scheduler(interval_seconds=60) # Check every minute
 
-    all_entries = data_manager.load_data() # Personal log entries
-    print(f"Loaded {len(all_entries)} personal log entries.")
-    # Note: Tasks are managed by task_manager, not loaded into all_entries here.
+    data_manager.load_entries() # Personal log entries, oldest first; add_entry keeps data_manager.ENTRIES in sync
+    print(f"Loaded {len(data_manager.ENTRIES)} personal log entries.")
+    # Note: Tasks are managed by task_manager, not loaded into data_manager.ENTRIES here.
 
     try: # Wrap main loop to ensure scheduler stops
         while True:
@@ -222,7 +254,6 @@ def run_assistant():
             if choice == '1':
                 new_entry = add_log_entry_interactive_cli()
                 if new_entry:
-                    all_entries.append(new_entry) # Keep local log entries list in sync
                     print("Log entry added successfully.")
             elif choice == '2':
                 # ... (Your existing "Ask for Advice" logic with expert routing and RAG) ...
@@ -232,42 +263,53 @@ def run_assistant():
                 # retrieved_chunks = data_manager.query_relevant_log_chunks(...)
                 # ai_response = llm_interaction.get_ai_response(..., expert_type=chosen_expert)
                 # --- Start of "Ask Advice" section (condensed from previous) ---
-                if not all_entries and not data_manager.RAG_ENABLED:
+                if not data_manager.ENTRIES and not data_manager.RAG_ENABLED:
                     print("No log entries or RAG available. Please add data first for advice.")
                     continue
                 user_query = input("What's on your mind? How can I help you reflect today?\n> ").strip()
                 if not user_query: continue
                 chosen_expert = route_to_expert_cli(user_query)
                 print(f"--- Routing to: {chosen_expert.replace('_', ' ').title()} ---")
-                rag_filter = None 
-                # (Simplified filter logic for CLI - adapt from app.py or make more specific)
-                if chosen_expert == "academic_advisor_expert": rag_filter = {"entry_type": "academic_setback"}
-                elif chosen_expert == "relationship_counselor_expert": rag_filter = {"entry_type": "interpersonal_conflict"}
-                # ... other expert filters ...
+                rag_filter = hot.EXPERT_RAG_FILTERS.get(chosen_expert) # Same expert -> filter mapping as app.py
+                query_embedding = data_manager.embed_query(user_query) # Encoded once, shared by the semantic cache and RAG
+                cached_response = semantic_cache.lookup(user_query, chosen_expert, rag_filter, query_embedding=query_embedding)
+                if cached_response: # Same question asked before (possibly rephrased): no retrieval, no LLM call
+                    print("\nMyMind AI says (from an earlier, similar question):\n--------------------------------------------------\n" + cached_response + "\n--------------------------------------------------")
+                    continue
                 context_string = ""
                 if data_manager.RAG_ENABLED:
                     print(f"Searching logs (RAG filter: {rag_filter if rag_filter else 'None'})...")
                     retrieved_chunks = data_manager.query_relevant_log_chunks(
-                        user_query, n_results=config.MAX_CONTEXT_ENTRIES_FOR_LLM, filter_metadata=rag_filter)
+                        user_query, n_results=config.MAX_CONTEXT_ENTRIES_FOR_LLM, filter_metadata=rag_filter,
+                        max_tokens=config.MAX_CONTEXT_TOKENS, query_embedding=query_embedding)
                     if retrieved_chunks: context_string = "\n\n---\n\n".join(retrieved_chunks)
-                if not context_string and all_entries: 
+                if not context_string and data_manager.ENTRIES: 
                     print("Using recent log entries as fallback context.")
-                    # ... (your fallback context summarization) ...
+                    # ENTRIES is oldest-first; every entry carries its precomputed _fallback_line
+                    context_string = hot.join_fallback_lines(data_manager.ENTRIES[-config.MAX_CONTEXT_ENTRIES_FOR_LLM:][::-1])
                 print(f"\nThinking with {chosen_expert.replace('_', ' ')}...")
-                ai_response = llm_interaction.get_ai_response(user_query, context_string, expert_type=chosen_expert)
-                print("\nMyMind AI says:\n--------------------------------------------------\n" + ai_response + "\n--------------------------------------------------")
+                print("\nMyMind AI says:\n--------------------------------------------------")
+                # Tokens are printed as they arrive instead of after the whole generation; an exact-match cache hit
+                # inside llm_interaction (same expert, context and query) is printed in one piece
+                response_status = {}
+                ai_response = llm_interaction.get_ai_response(user_query, context_string, expert_type=chosen_expert,
+                                                              streaming_callback=lambda text_delta: print(text_delta, end="", flush=True),
+                                                              status=response_status)
+                print("\n--------------------------------------------------")
+                if response_status.get("complete"): # Not an error reply or a stream that broke off midway
+                    semantic_cache.store(user_query, chosen_expert, rag_filter, ai_response, query_embedding=query_embedding)
                 # --- End of "Ask Advice" section ---
 
             elif choice == '3':
                 # ... (Your existing "View Most Recent Log Entries" logic) ...
                 print("\n--- Your Most Recent Log Entries ---")
-                if not all_entries: print("No log entries yet.")
+                if not data_manager.ENTRIES: print("No log entries yet.")
                 else:
-                    sorted_entries = sorted(all_entries, key=lambda x: x.get("timestamp_utc", ""), reverse=True)
-                    for i, entry_data in enumerate(sorted_entries[:5]):
+                    recent_entries = data_manager.ENTRIES[-5:][::-1] # Newest first, no sort needed
+                    for i, entry_data in enumerate(recent_entries):
                         print(f"\nEntry {i+1} (ID: {entry_data.get('entry_id', 'N/A')} | Type: {entry_data.get('entry_type', 'N/A')})")
-                        print(json.dumps(entry_data, indent=2))
-                        if i < 4 and len(sorted_entries) > i + 1 : print("---")
+                        print(json.dumps(data_manager.strip_derived_fields(entry_data), indent=2))
+                        if i < len(recent_entries) - 1: print("---")
             elif choice == '4': # Add New Task
                 add_task_interactive_cli()
             elif choice == '5': # View Pending Tasks
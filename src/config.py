@@ -11,4 +11,15 @@ if not GEMINI_API_KEY:
 # src/config.py
 # ... (your GEMINI_API_KEY loading) ...
 
-MAX_CONTEXT_ENTRIES_FOR_LLM = 5 # Or your preferred number for fallback
\ No newline at end of file
+MAX_CONTEXT_ENTRIES_FOR_LLM = 5 # Or your preferred number for fallback
+MAX_CONTEXT_TOKENS = 1500 # Approximate budget (chars / 4) for retrieved RAG chunks in one prompt
+MIN_CONTEXT_CHARS_FOR_LLM = int(os.getenv("MYMIND_MIN_CONTEXT_CHARS", "50")) # Below this, reply "not enough logs" locally instead of calling Gemini
+
+# --- Memory bounds for long-running Streamlit sessions ---
+MAX_CHAT_HISTORY_TURNS = 5000 # Hard cap on st.session_state.chat_history
+CHAT_HISTORY_TRIM_TO = 4500 # Turns kept once the cap is hit; the evicted prefix is archived to disk
+MAX_ENTRIES_IN_MEMORY = 5000 # Most recent log entries the app keeps in memory; older ones are read from disk on demand
+ARCHIVE_DIR = os.path.expanduser("~/.mymind/archive")
+
+# --- LLM response delivery ---
+STREAMING_ENABLED = os.getenv("MYMIND_STREAMING", "1") != "0" # Stream the chat reply token by token; set MYMIND_STREAMING=0 to render it in one piece
@@ -1,8 +1,30 @@
 # src/data_manager.py
+import atexit
 import json
+import mmap
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 import uuid 
 
+from .paths import CHROMA_DB_PATH # Re-exported: callers use data_manager.CHROMA_DB_PATH
+
+try:
+    import orjson # Optional: C-level JSON parsing for the JSONL log
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import numpy as np # Installed with sentence-transformers; used for exact in-process search on small collections
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 try:
     from sentence_transformers import SentenceTransformer
     SENTENCE_TRANSFORMER_AVAILABLE = True
@@ -19,37 +41,167 @@ except ImportError:
 
 DATA_FILE_PATH = "my_personal_data.jsonl" 
 EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2' 
-CHROMA_DB_PATH = "./chroma_db_store" 
 COLLECTION_NAME = "personal_log_embeddings"
+# Embedding inference: on a CUDA GPU the model runs in FP16. On CPU, MYMIND_EMBEDDING_BACKEND switches to one of the
+# ONNX exports that ship with the model, run by ONNX Runtime (needs sentence-transformers>=3.2 with `optimum[onnxruntime]`):
+# "onnx" gives the same FP32 vectors as torch, only faster; "onnx-int8" is dynamically quantized and faster still, but
+# its vectors drift slightly from an FP32-built index, so re-embed everything (batch_index_all_logs(force=True), or
+# `python batch_indexer.py --force`) after switching to or from it.
+EMBEDDING_BACKEND = os.getenv("MYMIND_EMBEDDING_BACKEND", "torch").lower()
+ONNX_MODEL_FILES = {"onnx": "onnx/model.onnx", "onnx-int8": "onnx/model_qint8_avx512_vnni.onnx"}
+# None lets SentenceTransformer pick the best device itself (CUDA, then Apple MPS, then CPU); MYMIND_EMBEDDING_DEVICE overrides it
+EMBEDDING_DEVICE = os.getenv("MYMIND_EMBEDDING_DEVICE") or None
+# Intra-op threads for CPU inference; MiniLM-sized encodes stop scaling (and start contending) beyond ~8 threads
+TORCH_THREADS = int(os.getenv("MYMIND_TORCH_THREADS", "0")) or min(8, os.cpu_count() or 4)
+EMBED_BATCH_SIZE = 32 # Chunks per forward pass inside encode()
+# Bulk (re-)indexing on CPU can spread encode() over this many worker processes (MYMIND_ENCODE_PROCESSES, 0 = off).
+# Off by default: on GPU or few-core hosts the process startup and IPC cost more than they save.
+ENCODE_PROCESSES = int(os.getenv("MYMIND_ENCODE_PROCESSES", "0"))
+MULTI_PROCESS_MIN_CHUNKS = 2000 # Below this a single process finishes before a pool has started
+CHROMA_ADD_BATCH_SIZE = 1000 # Chunks per collection.add call when (re-)indexing in bulk (Chroma caps the batch size)
+# HNSW settings sized for a personal-scale collection (hundreds to low thousands of chunks): a low graph
+# degree and ef values keep construction and queries cheap without losing recall at this size.
+# They only take effect when the collection is created: an existing collection is opened as is (a mismatch is
+# reported at startup), so run `python batch_indexer.py --rebuild` to re-create it with these settings.
+# Note: Chroma keeps vectors as float32 and has no scalar (int8/SQ8) quantization option, so quantizing before
+# `add` would not shrink the index. At this corpus size the FP32 index is a few MB; revisit with a store that
+# supports quantized HNSW (e.g. FAISS IndexHNSWSQ) if the collection grows by orders of magnitude.
+# "cosine" in hnswlib is inner product over vectors normalized at insert, so it already costs what "ip" would;
+# all encode() calls also pass normalize_embeddings=True, so vectors are unit length whatever the model.
+COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 8,
+    "hnsw:construction_ef": 64,
+    "hnsw:search_ef": 32,
+}
 RAG_ENABLED = SENTENCE_TRANSFORMER_AVAILABLE and CHROMADB_AVAILABLE
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers only need to catch the latter
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+def _json_dumps_line(obj):
+    """One JSONL record as UTF-8 bytes, newline included."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj) + '\n').encode('utf-8')
 
 embedding_model_instance = None
 vector_store_client_instance = None
 vector_collection_instance = None
 rag_components_initialized = False
+# Initialization may run on a startup thread, the indexer thread and a request thread at once; the lock makes
+# each component load exactly once and makes later callers wait for an in-progress load instead of duplicating it.
+_rag_init_lock = threading.RLock()
 
+# Embedding + Chroma upsert of new entries runs off the caller's thread; one worker keeps index writes ordered.
+# Entries queued while the worker is busy are coalesced into batches of up to INDEX_BATCH_SIZE.
+INDEX_BATCH_SIZE = 32
+INDEXER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-indexer")
+_pending_index_entries = [] # Guarded by _pending_index_lock
+_pending_index_count = 0 # Queued + in-flight entries
+_indexed_chunk_total = 0 # Chunks this process has added to the collection; lets callers keep a cached count() current
+_pending_index_lock = threading.Lock()
+
+
+def initialize_vector_store_if_needed():
+    """
+    Opens only the ChromaDB client and collection, without loading the embedding model.
+    Cheap enough for app startup: collection.count() etc. work before the first RAG query pays for the model.
+    """
+    global vector_store_client_instance, vector_collection_instance
+    if not RAG_ENABLED:
+        return False
+    if vector_collection_instance is not None:
+        return True
+    with _rag_init_lock:
+        if vector_collection_instance is not None: # Opened by another thread while we waited
+            return True
+        return _open_vector_store()
+
+def _open_vector_store():
+    global vector_store_client_instance, vector_collection_instance
+    try:
+        if vector_store_client_instance is None:
+            vector_store_client_instance = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+            print("RAG: ChromaDB client initialized.")
+        # Not get_or_create_collection: with differing metadata it relabels an existing collection
+        # (e.g. an l2 one as cosine) without rebuilding its HNSW index
+        try:
+            vector_collection_instance = vector_store_client_instance.get_collection(name=COLLECTION_NAME)
+        except Exception: # Does not exist yet (ValueError or InvalidCollectionException, depending on the chromadb version)
+            vector_collection_instance = vector_store_client_instance.create_collection(name=COLLECTION_NAME, metadata=COLLECTION_METADATA)
+        else:
+            _warn_on_collection_metadata_mismatch(vector_collection_instance.metadata or {})
+        print(f"RAG: Chroma collection '{COLLECTION_NAME}' ready. Count: {vector_collection_instance.count()}")
+        return True
+    except Exception as e:
+        print(f"RAG: Error initializing ChromaDB collection: {e}")
+        vector_store_client_instance = None
+        vector_collection_instance = None
+        return False
+
+
+def _warn_on_collection_metadata_mismatch(collection_metadata):
+    differing = {key: collection_metadata.get(key, "l2" if key == "hnsw:space" else "default") for key, value in COLLECTION_METADATA.items() if collection_metadata.get(key) != value}
+    if differing:
+        print(f"RAG: Warning: collection '{COLLECTION_NAME}' was created with {differing}, not {COLLECTION_METADATA}. "
+              "It is used as is; run `python batch_indexer.py --rebuild` to re-create it with the current settings.")
+
+def _recreate_collection():
+    """Drops the collection and creates it again with COLLECTION_METADATA; every entry has to be re-indexed afterwards."""
+    global vector_collection_instance
+    vector_store_client_instance.delete_collection(name=COLLECTION_NAME)
+    vector_collection_instance = vector_store_client_instance.create_collection(name=COLLECTION_NAME, metadata=COLLECTION_METADATA)
+    with _memory_index_lock:
+        _memory_index.update(state="unloaded", matrix=None, documents=[], metadatas=[], position_by_id={}, shards={})
+    _cached_query.cache_clear()
 
 def initialize_rag_if_needed():
-    global embedding_model_instance, vector_store_client_instance, vector_collection_instance, rag_components_initialized
+    global rag_components_initialized
     if not RAG_ENABLED:
         rag_components_initialized = True 
         return False
-    if rag_components_initialized and vector_collection_instance is not None: # Check if fully initialized
+    if rag_components_initialized and vector_collection_instance is not None and embedding_model_instance is not None: # Check if fully initialized
         return True
+    with _rag_init_lock:
+        if vector_collection_instance is not None and embedding_model_instance is not None: # Loaded by another thread while we waited
+            return True
+        return _load_rag_components()
 
+def _configure_torch_threads():
+    """Pins PyTorch's CPU thread pools to TORCH_THREADS; must run before the first forward pass."""
+    try:
+        import torch # Installed with sentence-transformers
+        torch.set_num_threads(TORCH_THREADS)
+        torch.set_num_interop_threads(1) # One encode() at a time: inter-op parallelism only adds contention
+    except (ImportError, RuntimeError) as e: # RuntimeError: inter-op pool already started by earlier torch work
+        print(f"RAG: Could not configure torch threads: {e}")
+
+def _load_embedding_model():
+    """Loads the SentenceTransformer in the cheapest precision the hardware (and EMBEDDING_BACKEND) allows."""
+    _configure_torch_threads()
+    if EMBEDDING_BACKEND in ONNX_MODEL_FILES:
+        try:
+            model = SentenceTransformer(EMBEDDING_MODEL_NAME, backend="onnx",
+                                        model_kwargs={"file_name": ONNX_MODEL_FILES[EMBEDDING_BACKEND]})
+            print(f"RAG: Using the ONNX Runtime embedding model ({EMBEDDING_BACKEND}).")
+            return model
+        except Exception as e: # Older sentence-transformers, optimum/onnxruntime missing, or no such export
+            print(f"RAG: ONNX embedding model unavailable, falling back to the default model: {e}")
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=EMBEDDING_DEVICE)
+    if model.device.type == "cuda":
+        model.half()
+        print("RAG: Running the embedding model in FP16 on the GPU.")
+    return model
+
+def _load_rag_components():
+    global embedding_model_instance, vector_store_client_instance, vector_collection_instance, rag_components_initialized
     print("RAG: Attempting to initialize RAG components...")
     try:
         if embedding_model_instance is None:
-            embedding_model_instance = SentenceTransformer(EMBEDDING_MODEL_NAME)
-            print("RAG: SentenceTransformer model initialized.")
-        if vector_store_client_instance is None:
-            vector_store_client_instance = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-            print("RAG: ChromaDB client initialized.")
-        if vector_collection_instance is None:
-            vector_collection_instance = vector_store_client_instance.get_or_create_collection(
-                name=COLLECTION_NAME,
-            )
-            print(f"RAG: Chroma collection '{COLLECTION_NAME}' ready. Count: {vector_collection_instance.count()}")
+            embedding_model_instance = _load_embedding_model()
+            print(f"RAG: SentenceTransformer model initialized on {embedding_model_instance.device}.")
+        if not initialize_vector_store_if_needed():
+            raise RuntimeError("ChromaDB collection could not be opened.")
         rag_components_initialized = True
         print("RAG: All RAG components initialized successfully.")
         return True
@@ -69,7 +221,8 @@ def extract_text_chunks_for_embedding(entry_data):
     chunks = []
     entry_type = entry_data.get("entry_type", "unknown_entry")
     primary_emotion = entry_data.get("primary_emotion", "")
-    summary = entry_data.get("trigger_event", {}).get("summary", "")
+    trigger_event = entry_data.get("trigger_event") or {}
+    summary = trigger_event.get("summary", "")
 
     if summary:
         chunks.append(f"Log about '{summary}' (Type: {entry_type}).")
@@ -82,68 +235,327 @@ def extract_text_chunks_for_embedding(entry_data):
         thoughts_str = ". ".join(thoughts_list)
         chunks.append(f"My thoughts were: {thoughts_str}")
 
-    learnings_list = entry_data.get("reflection_learnings", {}).get("insights_gained", [])
+    reflection_learnings = entry_data.get("reflection_learnings") or {}
+    learnings_list = reflection_learnings.get("insights_gained", [])
     if learnings_list:
         learnings_str = ". ".join(learnings_list)
         chunks.append(f"Key learnings included: {learnings_str}")
         
     # Add more specific chunking based on other fields if desired
 
-    return [chunk for chunk in chunks if chunk and len(chunk.split()) > 3]
+    # "More than 3 words" via a space count: no throwaway word list per chunk
+    return [chunk for chunk in chunks if chunk and chunk.count(" ") >= 3]
 
 
-def _index_entry_for_rag(entry_data):
+def _build_chunk_records(entry_data):
+    """Chunks of one entry plus their Chroma metadatas and ids, ready for collection.add."""
+    # Entries are immutable once written, so the chunks are extracted once per in-memory entry and reused on
+    # re-index. Like the other "_" fields this stays in memory: it is cheap to rebuild and never written to the JSONL.
+    chunks_to_embed = entry_data.get("_rag_chunks")
+    if chunks_to_embed is None:
+        chunks_to_embed = entry_data["_rag_chunks"] = extract_text_chunks_for_embedding(entry_data)
+    if not chunks_to_embed:
+        return [], [], []
+
+    entry_id_str = str(entry_data.get("entry_id", ""))
+    timestamp_str = str(entry_data.get("timestamp_utc", ""))
+    # --- ENSURE THESE METADATA FIELDS MATCH WHAT app.py TRIES TO FILTER ON ---
+    entry_type_str = str(entry_data.get("entry_type", "unknown")).lower() # Use consistent casing for filtering
+    primary_emotion_str = str(entry_data.get("primary_emotion", "")).lower() 
+    tags_str = ",".join(str(tag).lower() for tag in entry_data.get("tags", []))
+
+    # Every field but the chunk text is the same for all chunks of the entry, so it is computed once above
+    metadatas = [{
+        "entry_id": entry_id_str,
+        "timestamp_utc": timestamp_str,
+        "entry_type": entry_type_str, # THIS IS CRUCIAL FOR FILTERING
+        "primary_emotion": primary_emotion_str, # CRUCIAL FOR FILTERING
+        "tags_str": tags_str, # For potential text search within tags or simple tag filtering
+        "source_document_text": chunk 
+    } for chunk in chunks_to_embed]
+    
+    # Deterministic per (entry, chunk position): re-indexing an entry overwrites its chunks via upsert instead of duplicating them
+    ids = [f"{entry_id_str}:{chunk_index}" for chunk_index in range(len(chunks_to_embed))]
+    return chunks_to_embed, metadatas, ids
+
+
+def _index_entries_for_rag(entries):
+    """Embeds the chunks of several entries with one encode call and stores them with a single collection.add."""
     if not RAG_ENABLED or not rag_components_initialized or not vector_collection_instance or not embedding_model_instance:
         return
 
-    chunks_to_embed = extract_text_chunks_for_embedding(entry_data)
-    if not chunks_to_embed:
+    all_chunks, all_metadatas, all_ids = [], [], []
+    for entry_data in entries:
+        chunks, metadatas, ids = _build_chunk_records(entry_data)
+        all_chunks.extend(chunks)
+        all_metadatas.extend(metadatas)
+        all_ids.extend(ids)
+    if not all_chunks:
         return
 
+    global _indexed_chunk_total
+    entry_ids_str = ", ".join(str(entry_data.get("entry_id", "N/A")) for entry_data in entries)
     try:
-        embeddings = embedding_model_instance.encode(chunks_to_embed).tolist()
-        
-        entry_id_str = str(entry_data.get("entry_id", ""))
-        # --- ENSURE THESE METADATA FIELDS MATCH WHAT app.py TRIES TO FILTER ON ---
-        entry_type_str = str(entry_data.get("entry_type", "unknown")).lower() # Use consistent casing for filtering
-        primary_emotion_str = str(entry_data.get("primary_emotion", "")).lower() 
-        tags_list = [str(tag).lower() for tag in entry_data.get("tags", [])]
-
-        metadatas = [{
-            "entry_id": entry_id_str,
-            "timestamp_utc": str(entry_data.get("timestamp_utc", "")),
-            "entry_type": entry_type_str, # THIS IS CRUCIAL FOR FILTERING
-            "primary_emotion": primary_emotion_str, # CRUCIAL FOR FILTERING
-            "tags_str": ",".join(tags_list), # For potential text search within tags or simple tag filtering
-            "source_document_text": chunk 
-        } for chunk in chunks_to_embed]
-        
-        ids = [str(uuid.uuid4()) for _ in chunks_to_embed]
-
-        vector_collection_instance.add(embeddings=embeddings, documents=chunks_to_embed, metadatas=metadatas, ids=ids)
-        print(f"RAG: Indexed {len(chunks_to_embed)} chunks for entry_id: {entry_id_str} (Type: {entry_type_str})")
+        # A float32 ndarray goes to Chroma as is: no list of boxed Python floats (FP16 models return float16, hence astype)
+        embeddings = embedding_model_instance.encode(all_chunks, batch_size=EMBED_BATCH_SIZE, normalize_embeddings=True).astype(np.float32, copy=False)
+        vector_collection_instance.upsert(embeddings=embeddings, documents=all_chunks, metadatas=all_metadatas, ids=all_ids)
+        _upsert_memory_index(all_ids, embeddings, all_chunks, all_metadatas)
+        _cached_query.cache_clear() # New chunks can change any cached retrieval
+        _indexed_chunk_total += len(all_chunks)
+        print(f"RAG: Indexed {len(all_chunks)} chunks for {len(entries)} entries (IDs: {entry_ids_str})")
     except Exception as e:
-        print(f"RAG: Error during _index_entry_for_rag for entry_id {entry_data.get('entry_id', 'N/A')}: {e}")
+        print(f"RAG: Error during _index_entries_for_rag for entry_ids {entry_ids_str}: {e}")
 
 
-def load_data():
-    entries = []
+def _index_entry_for_rag(entry_data):
+    _index_entries_for_rag([entry_data])
+
+
+# Derived, in-memory-only fields are prefixed with "_" and never written to the JSONL file.
+def format_fallback_context_line(entry):
+    """One-line summary of an entry used as LLM context when RAG returns nothing."""
+    return (f"Entry ID: {entry.get('entry_id')}, Type: {entry.get('entry_type')}, Emotion: {entry.get('primary_emotion','N/A')}, "
+            f"Summary: {(entry.get('trigger_event') or {}).get('summary') or 'N/A'}, "
+            f"Learnings: {'. '.join((entry.get('reflection_learnings') or {}).get('insights_gained') or [])}")
+
+def _attach_derived_fields(entry):
+    """Precomputes per-entry strings that the hot paths would otherwise rebuild on every use. Entries are immutable once written."""
+    entry["_fallback_line"] = format_fallback_context_line(entry)
+    entry["_search_blob"] = get_searchable_text(entry).casefold() # Case-folded once here, not per keystroke
+    return entry
+
+def strip_derived_fields(entry):
+    """Returns the entry without the in-memory "_" fields, i.e. as stored in the JSONL file."""
+    return {key: value for key, value in entry.items() if not key.startswith("_")}
+
+
+def load_data(max_entries=None):
+    """
+    Loads log entries from the JSONL file, oldest first. If max_entries is set, only the most recent (last appended) ones are kept.
+    add_entry only ever appends entries stamped with the current UTC time, so file order is chronological order:
+    reversing the list gives newest-first without a sort.
+    """
+    if max_entries: # Only the tail is parsed: the line-offset index locates it without reading the rest
+        if not os.path.exists(DATA_FILE_PATH):
+            print(f"Data file '{DATA_FILE_PATH}' not found. Starting with an empty dataset.")
+            return []
+        entries = get_recent_entries(0, max_entries)
+        entries.reverse()
+        return entries
+    return [_attach_derived_fields(entry) for entry in iter_data()]
+
+def iter_data():
+    """Yields the raw log entries (no derived "_" fields) one at a time, oldest first, without holding the whole log."""
     try:
-        with open(DATA_FILE_PATH, 'r', encoding='utf-8') as f:
+        with open(DATA_FILE_PATH, 'rb') as f: # Binary lines go straight to the parser, no text decoding pass
             for line in f:
                 line_content = line.strip()
                 if line_content:
                     try:
-                        entries.append(json.loads(line_content))
+                        yield _json_loads(line_content)
                     except json.JSONDecodeError:
-                        print(f"Warning: Skipping malformed JSON line: {line_content[:100]}...")
+                        print(f"Warning: Skipping malformed JSON line: {line_content[:100].decode('utf-8', 'replace')}...")
     except FileNotFoundError:
         print(f"Data file '{DATA_FILE_PATH}' not found. Starting with an empty dataset.")
+
+
+# --- Shared in-memory log for long-running callers (the CLI) ---
+# Filled by load_entries(); add_entry appends to it once it has been loaded, so callers never re-read the file
+# or keep their own copy in sync. Oldest first, like the file. The Streamlit app pages from disk instead and never loads it.
+ENTRIES = []
+_entries_loaded = False
+
+def load_entries():
+    """Loads the whole log into ENTRIES (replacing its contents) and returns that same list."""
+    global _entries_loaded
+    ENTRIES[:] = load_data()
+    _entries_loaded = True
+    return ENTRIES
+
+# --- Paged access: byte offsets of each line, so a page of entries can be read without parsing the whole file ---
+_line_offsets_cache = {"file_key": None, "offsets": []}
+_line_offsets_lock = threading.Lock()
+
+def _scan_line_offsets(f):
+    """Offsets of the non-blank lines in an open binary file: newlines are located with mmap.find (a C-level scan)."""
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError): # Empty file (nothing to map) or a platform/filesystem without mmap support
+        offsets = []
+        position = 0
+        for line in f:
+            if line.strip():
+                offsets.append(position)
+            position += len(line)
+        return offsets
+    with mm:
+        offsets = []
+        position, size = 0, len(mm)
+        while position < size:
+            newline = mm.find(b"\n", position)
+            line_end = size if newline == -1 else newline
+            if mm[position:line_end].strip():
+                offsets.append(position)
+            position = line_end + 1
+        return offsets
+
+def _get_line_offsets():
+    """Byte offsets of every non-blank line in the data file. Rebuilt (a newline scan, no JSON parsing) only when the file changes."""
+    try:
+        stat = os.stat(DATA_FILE_PATH)
+    except OSError:
+        return []
+    file_key = (stat.st_mtime_ns, stat.st_size)
+    with _line_offsets_lock:
+        if _line_offsets_cache["file_key"] != file_key:
+            with open(DATA_FILE_PATH, 'rb') as f:
+                offsets = _scan_line_offsets(f)
+            _line_offsets_cache["file_key"] = file_key
+            _line_offsets_cache["offsets"] = offsets
+        return _line_offsets_cache["offsets"]
+
+def count_entries():
+    return len(_get_line_offsets())
+
+def get_recent_entries(offset=0, limit=None):
+    """
+    Returns one page of entries, newest first, parsing only the requested lines.
+    The JSONL file is append-only with UTC timestamps, so file order is chronological order.
+    """
+    offsets = _get_line_offsets()
+    end = len(offsets) - offset
+    if end <= 0:
+        return []
+    start = 0 if limit is None else max(end - limit, 0)
+    entries = []
+    with open(DATA_FILE_PATH, 'rb') as f:
+        for line_offset in reversed(offsets[start:end]):
+            f.seek(line_offset)
+            line_content = f.readline().strip()
+            try:
+                entries.append(_attach_derived_fields(_json_loads(line_content)))
+            except json.JSONDecodeError:
+                print(f"Warning: Skipping malformed JSON line: {line_content[:100].decode('utf-8', 'replace')}...")
     return entries
 
 
+SEARCH_TOKEN_PATTERN = re.compile(r"\w+")
+
+def get_searchable_text(entry):
+    """Joins the fields covered by the View Log Entries search: summary, thoughts, insights and tags."""
+    # `or` rather than .get defaults: legacy entries can hold null for any of these fields
+    parts = [(entry.get("trigger_event") or {}).get("summary") or ""]
+    parts.extend(entry.get("my_thoughts_during") or [])
+    parts.extend((entry.get("reflection_learnings") or {}).get("insights_gained") or [])
+    parts.extend(entry.get("tags") or [])
+    return "\n".join(parts)
+
+def build_log_columns(entries):
+    """
+    Column-wise view of `entries` (parallel lists, same order): ids and the case-folded search
+    blob per entry. Substring search then is one `in` test per entry over flat strings instead of
+    nested .get() lookups and .lower() calls on every field.
+    """
+    return {
+        "ids": [entry.get("entry_id") for entry in entries],
+        "search_blobs": [entry.get("_search_blob") or get_searchable_text(entry).casefold() for entry in entries],
+    }
+
+def tokenize_for_search(text):
+    return SEARCH_TOKEN_PATTERN.findall(text.casefold())
+
+def search_candidate_tokens(search_term):
+    """
+    Tokens of a search term that any substring match must contain as whole words: those with a
+    non-word character on both sides inside the term ('deadline' in 'my deadline is'). The first and
+    last token of the term may be part of a longer word in a match ('exam' in 'exams'), so they are left out.
+    """
+    folded = search_term.casefold()
+    return [match.group() for match in SEARCH_TOKEN_PATTERN.finditer(folded) if match.start() > 0 and match.end() < len(folded)]
+
+def build_search_index(entries):
+    """
+    Builds an inverted index (token -> set of entry_ids) over the searchable fields. Searches use it to
+    narrow the candidates (see search_candidate_tokens); the substring test still decides what matches.
+    """
+    index = {}
+    for entry in entries:
+        entry_id = entry.get("entry_id")
+        for token in set(tokenize_for_search(entry.get("_search_blob") or get_searchable_text(entry))):
+            index.setdefault(token, set()).add(entry_id)
+    return index
+
+
+def get_data_file_mtime():
+    """Returns the data file's mtime (0.0 if missing); used as a cache key by callers that memoize load_data()."""
+    try:
+        return os.path.getmtime(DATA_FILE_PATH)
+    except OSError:
+        return 0.0
+
+
+def _drain_pending_index_entries():
+    """INDEXER job: indexes everything queued so far in batches. Later jobs find the queue empty and return."""
+    global _pending_index_count
+    rag_ready = initialize_rag_if_needed()
+    while True:
+        with _pending_index_lock:
+            batch = _pending_index_entries[:INDEX_BATCH_SIZE]
+            del _pending_index_entries[:INDEX_BATCH_SIZE]
+        if not batch:
+            return
+        try:
+            if rag_ready:
+                _index_entries_for_rag(batch)
+        finally:
+            with _pending_index_lock:
+                _pending_index_count -= len(batch)
+
+
+def get_indexed_chunk_total():
+    """Running total of chunks added by this process (an int read, no Chroma round-trip)."""
+    return _indexed_chunk_total
+
+def get_pending_index_count():
+    """Number of added entries whose RAG indexing has not finished yet."""
+    return _pending_index_count
+
+
+# --- JSONL appends: one long-lived handle, flushed per entry, fsync'ed in groups ---
+# Every write is flushed to the OS right away (readers and mtime-keyed caches see it immediately);
+# the fsync to disk runs every FSYNC_EVERY_N_ENTRIES entries or FSYNC_INTERVAL_SECONDS, and at exit.
+FSYNC_EVERY_N_ENTRIES = 8
+FSYNC_INTERVAL_SECONDS = 1.0
+_append_state = {"file": None, "unsynced": 0, "last_fsync": 0.0}
+_append_lock = threading.Lock()
+
+def _append_jsonl_line(line_bytes):
+    with _append_lock:
+        f = _append_state["file"]
+        if f is None or f.closed:
+            f = _append_state["file"] = open(DATA_FILE_PATH, 'ab')
+        f.write(line_bytes)
+        f.flush()
+        _append_state["unsynced"] += 1
+        now = time.monotonic()
+        if _append_state["unsynced"] >= FSYNC_EVERY_N_ENTRIES or now - _append_state["last_fsync"] >= FSYNC_INTERVAL_SECONDS:
+            os.fsync(f.fileno())
+            _append_state["unsynced"] = 0
+            _append_state["last_fsync"] = now
+
+@atexit.register
+def _close_append_file():
+    with _append_lock:
+        f = _append_state["file"]
+        if f is not None and not f.closed:
+            f.flush()
+            if _append_state["unsynced"]:
+                os.fsync(f.fileno())
+            f.close()
+
+
 def add_entry(entry_type_from_form, data_dict): # Renamed first arg for clarity
-    initialize_rag_if_needed()
+    global _pending_index_count
     timestamp = datetime.utcnow().isoformat() + "Z"
     entry_id = str(uuid.uuid4())
 
@@ -154,6 +566,10 @@ def add_entry(entry_type_from_form, data_dict): # Renamed first arg for clarity
         "entry_type": entry_type_from_form.lower(), # Standardize to lowercase
         **data_dict 
     }
+    # The log is append-ordered and every reader takes file order as chronological order ("most recent" = last
+    # appended), so the id and the current-time stamp always win over anything in data_dict (no back-dating)
+    new_entry_data["entry_id"] = entry_id
+    new_entry_data["timestamp_utc"] = timestamp
     # Ensure primary_emotion and tags in data_dict are also consistently cased if not already
     if "primary_emotion" in new_entry_data:
         new_entry_data["primary_emotion"] = str(new_entry_data["primary_emotion"]).lower()
@@ -162,81 +578,372 @@ def add_entry(entry_type_from_form, data_dict): # Renamed first arg for clarity
 
 
     try:
-        with open(DATA_FILE_PATH, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(new_entry_data) + '\n')
+        _append_jsonl_line(_json_dumps_line(new_entry_data))
         print(f"Entry of type '{new_entry_data['entry_type']}' (ID: {entry_id}) added successfully to JSONL.")
-        _index_entry_for_rag(new_entry_data) # Will use the new_entry_data['entry_type'] for metadata
-        return new_entry_data
+        _attach_derived_fields(new_entry_data) # After the write, so derived fields stay in memory only
+        if _entries_loaded:
+            ENTRIES.append(new_entry_data)
+    except Exception as e:
+        print(f"Error adding entry to JSONL: {e}")
+        return None
+    # The JSONL write above is the durable part; embedding + upsert happen on the INDEXER thread
+    with _pending_index_lock:
+        _pending_index_entries.append(new_entry_data) # Will use the new_entry_data['entry_type'] for metadata
+        _pending_index_count += 1
+    INDEXER.submit(_drain_pending_index_entries)
+    return new_entry_data
+
+# --- Exact in-process search for small collections ---
+# Below IN_MEMORY_SEARCH_MAX_CHUNKS chunks, one matrix-vector product over all (unit) embeddings is cheaper than
+# Chroma's query path, and it is exact. The matrix is loaded from the collection on first query and extended by
+# every add from this process; larger collections, or filters it can't evaluate, go to Chroma as before.
+IN_MEMORY_SEARCH_MAX_CHUNKS = 10_000
+# Filtered queries search a per-filter shard: the positions of the matching rows and their sub-matrix, built on the
+# first query with that filter and dropped whenever the index changes. Experts use a handful of fixed filters, so
+# this stays small and each filtered query scores only its shard instead of evaluating the filter on every row.
+_memory_index = {"state": "unloaded", "matrix": None, "documents": [], "metadatas": [], "position_by_id": {}, "shards": {}} # state: unloaded | ready | disabled
+_memory_index_lock = threading.Lock()
+
+def _load_memory_index_locked():
+    try:
+        if vector_collection_instance.count() > IN_MEMORY_SEARCH_MAX_CHUNKS:
+            _memory_index["state"] = "disabled"
+            return
+        rows = vector_collection_instance.get(include=['embeddings', 'documents', 'metadatas'])
+        embeddings = rows.get('embeddings')
+        matrix = np.asarray(embeddings if embeddings is not None else [], dtype=np.float32)
+        if len(matrix):
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1, norms) # Rows written by older versions may not be unit length
+        _memory_index.update(state="ready", matrix=matrix, documents=list(rows.get('documents') or []), metadatas=list(rows.get('metadatas') or []),
+                             position_by_id={chunk_id: position for position, chunk_id in enumerate(rows.get('ids') or [])}, shards={})
+        print(f"RAG: Loaded {len(matrix)} chunk embeddings for in-process search.")
     except Exception as e:
-        print(f"Error adding entry (JSONL or RAG indexing): {e}")
+        print(f"RAG: In-process search disabled, could not load embeddings: {e}")
+        _memory_index["state"] = "disabled"
+
+def _upsert_memory_index(ids, embeddings, documents, metadatas):
+    """Keeps a loaded in-memory index in step with chunks this process upserts: known ids are overwritten, new ones appended."""
+    if not NUMPY_AVAILABLE:
+        return
+    with _memory_index_lock:
+        if _memory_index["state"] != "ready":
+            return
+        position_by_id = dict(_memory_index["position_by_id"])
+        matrix = _memory_index["matrix"]
+        matrix = matrix.copy() if matrix is not None and len(matrix) else np.empty((0, len(embeddings[0])), dtype=np.float32)
+        documents_list, metadatas_list = list(_memory_index["documents"]), list(_memory_index["metadatas"])
+        new_rows = []
+        for chunk_id, embedding, document, metadata in zip(ids, embeddings, documents, metadatas):
+            position = position_by_id.get(chunk_id)
+            if position is None:
+                position_by_id[chunk_id] = len(documents_list)
+                documents_list.append(document)
+                metadatas_list.append(metadata)
+                new_rows.append(embedding)
+            elif position < len(matrix):
+                matrix[position] = embedding
+                documents_list[position], metadatas_list[position] = document, metadata
+            else: # Repeated id within this batch
+                new_rows[position - len(matrix)] = embedding
+                documents_list[position], metadatas_list[position] = document, metadata
+        if len(documents_list) > IN_MEMORY_SEARCH_MAX_CHUNKS:
+            _memory_index.update(state="disabled", matrix=None, documents=[], metadatas=[], position_by_id={}, shards={})
+            return
+        if new_rows:
+            matrix = np.vstack([matrix, np.asarray(new_rows, dtype=np.float32)])
+        # Readers take references under the lock, so the structures are replaced rather than mutated in place
+        _memory_index.update(matrix=matrix, documents=documents_list, metadatas=metadatas_list, position_by_id=position_by_id, shards={})
+
+def _metadata_matches(metadata, where):
+    """Evaluates the Chroma `where` subset used here (equality, $eq, $ne, $in, $or, $and). Raises ValueError otherwise."""
+    for key, condition in where.items():
+        if key == "$or":
+            if not any(_metadata_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(_metadata_matches(metadata, clause) for clause in condition):
+                return False
+        elif key.startswith("$"):
+            raise ValueError(f"unsupported operator {key}")
+        elif isinstance(condition, dict):
+            for operator, operand in condition.items():
+                value = metadata.get(key)
+                if operator == "$eq": matched = value == operand
+                elif operator == "$ne": matched = value != operand
+                elif operator == "$in": matched = value in operand
+                else: raise ValueError(f"unsupported operator {operator}")
+                if not matched:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+def _query_memory_index(query_embedding, where, n_candidates):
+    """Chroma-shaped query results from the in-memory index, or None when the caller should ask Chroma."""
+    if not NUMPY_AVAILABLE:
+        return None
+    with _memory_index_lock:
+        if _memory_index["state"] == "unloaded":
+            _load_memory_index_locked()
+        if _memory_index["state"] != "ready":
+            return None
+        matrix, documents, metadatas = _memory_index["matrix"], _memory_index["documents"], _memory_index["metadatas"]
+        shards = _memory_index["shards"]
+    if matrix is None or not len(matrix):
+        return {'documents': [[]], 'metadatas': [[]], 'embeddings': [[]]}
+    positions, search_matrix = None, matrix
+    if where:
+        shard_key = json.dumps(where, sort_keys=True)
+        shard = shards.get(shard_key)
+        if shard is None:
+            try:
+                mask = np.fromiter((_metadata_matches(metadata or {}, where) for metadata in metadatas), dtype=bool, count=len(metadatas))
+            except ValueError:
+                return None
+            shard = (np.flatnonzero(mask), matrix[mask])
+            with _memory_index_lock:
+                if _memory_index["shards"] is shards: # Index unchanged since we read it
+                    shards[shard_key] = shard
+        positions, search_matrix = shard
+    scores = search_matrix @ np.asarray(query_embedding, dtype=np.float32)
+    n_candidates = min(n_candidates, len(scores))
+    if n_candidates <= 0:
+        return {'documents': [[]], 'metadatas': [[]], 'embeddings': [[]]}
+    top = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+    top = top[np.argsort(-scores[top])]
+    if positions is not None:
+        top = positions[top] # Shard rows back to positions in the full index
+    return {
+        'documents': [[documents[i] for i in top]],
+        'metadatas': [[metadatas[i] for i in top]],
+        'embeddings': [[matrix[i].tolist() for i in top]],
+    }
+
+
+QUERY_CACHE_SIZE = 256 # Distinct (query, filter, n_results) retrievals kept by the LRU cache
+EMBEDDING_CACHE_SIZE = 1024 # Distinct query texts whose embeddings are kept; these survive re-indexing
+
+@lru_cache(maxsize=EMBEDDING_CACHE_SIZE)
+def _embed_query(query_text):
+    """Query embedding as a tuple (immutable, so it is safe to share from the cache). Depends only on the model, not the corpus."""
+    return tuple(embedding_model_instance.encode(query_text, normalize_embeddings=True).tolist())
+
+# --- Post-retrieval selection: drop near-duplicate chunks and keep the context within a token budget ---
+DUPLICATE_SIMILARITY_THRESHOLD = 0.92 # Cosine similarity above which a chunk repeats one already selected
+CANDIDATE_POOL_FACTOR = 2 # Fetch this many times n_results so dropped duplicates can be replaced
+
+def _select_context_chunks(documents, metadatas, embeddings, n_results, max_tokens):
+    """
+    Walks the candidates in rank order, skipping any chunk too similar to an already selected one, until
+    n_results chunks are taken or the next one would exceed max_tokens (approximated as len(text) // 4).
+    The first chunk is always kept. Without embeddings only the budget and n_results apply.
+    """
+    unit_rows = None
+    if embeddings is not None and NUMPY_AVAILABLE and len(embeddings):
+        # Unit rows once up front, so each duplicate check is one matrix-vector product against the kept rows
+        unit_rows = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(unit_rows, axis=1, keepdims=True)
+        unit_rows = unit_rows / np.where(norms == 0, 1, norms)
+    selected_documents, selected_metadatas, selected_positions = [], [], []
+    used_tokens = 0
+    for position, document in enumerate(documents):
+        if len(selected_documents) >= n_results:
+            break
+        if unit_rows is not None and selected_positions and np.max(unit_rows[selected_positions] @ unit_rows[position]) > DUPLICATE_SIMILARITY_THRESHOLD:
+            continue
+        document_tokens = len(document) // 4
+        if max_tokens and selected_documents and used_tokens + document_tokens > max_tokens:
+            break
+        selected_documents.append(document)
+        selected_metadatas.append(metadatas[position])
+        selected_positions.append(position)
+        used_tokens += document_tokens
+    return tuple(selected_documents), tuple(selected_metadatas)
+
+def embed_query(query_text):
+    """The (cached) embedding of a query as a list of floats, or None if RAG isn't available."""
+    if not RAG_ENABLED or not initialize_rag_if_needed() or not embedding_model_instance:
         return None
+    return list(_embed_query(query_text))
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _cached_query(query_text, filter_json, n_results, max_tokens=None, query_embedding=None):
+    """
+    Embeds the query and runs the Chroma search, returning (documents, metadatas) tuples after dropping
+    near-duplicates and applying the token budget. Results are memoized per (query, filter, n_results,
+    max_tokens) so Streamlit reruns don't re-embed the same prompt; the cache is cleared whenever new
+    chunks are indexed. Exceptions propagate (and are therefore not cached).
+    """
+    if query_embedding is None:
+        query_embedding = _embed_query(query_text) # A retrieval miss after re-indexing or with another filter still skips the encoder
+    query_embedding = list(query_embedding)
+
+    query_params = {
+        "query_embeddings": [query_embedding],
+        "n_results": n_results * CANDIDATE_POOL_FACTOR,
+        "include": ['documents', 'metadatas', 'embeddings'] # Embeddings are only used for the duplicate check
+    }
+    if filter_json is not None:
+        query_params["where"] = json.loads(filter_json)
+        print(f"RAG Query: Using metadata filter: {query_params['where']}")
+
+    results = _query_memory_index(query_embedding, query_params.get("where"), query_params["n_results"])
+    if results is None:
+        results = vector_collection_instance.query(**query_params)
+
+    if results and results.get('documents') and results['documents'][0]:
+        print(f"RAG Query: Found {len(results['documents'][0])} relevant chunks for query '{query_text[:50]}...'")
+        # print(f"DEBUG RAG: Metadatas of retrieved chunks: {results.get('metadatas',[[]])[0]}") # For debugging
+        metadatas = (results.get('metadatas') or [[]])[0] or [{}] * len(results['documents'][0])
+        embeddings = results.get('embeddings')
+        embeddings = embeddings[0] if embeddings is not None and len(embeddings) else None
+        return _select_context_chunks(results['documents'][0], metadatas, embeddings, n_results, max_tokens)
+    print(f"RAG Query: No relevant chunks found for query '{query_text[:50]}...' (with current filters).")
+    return (), ()
 
-def query_relevant_log_chunks(query_text, n_results=5, filter_metadata=None):
-    if not RAG_ENABLED or not initialize_rag_if_needed() or not vector_collection_instance or not embedding_model_instance:
+
+def query_relevant_log_chunks(query_text, n_results=5, filter_metadata=None, with_metadata=False, max_tokens=None, query_embedding=None):
+    """
+    Top-n chunk texts for the query, near-duplicates removed and (if max_tokens is set) trimmed to that
+    approximate token budget. Pass query_embedding (e.g. from embed_query) when the caller already has it. With with_metadata=True, returns (text, metadata) pairs instead,
+    read straight from the Chroma response (entry_id, entry_type, timestamp_utc, ...), so callers
+    don't need to look the source entries up in the JSONL log.
+    """
+    # initialize_rag_if_needed() is True only once the model and collection are both loaded (a flag check after that)
+    if not initialize_rag_if_needed():
         print("RAG: Querying skipped - RAG not enabled or components not ready.")
         return []
     try:
-        query_embedding = embedding_model_instance.encode(query_text).tolist()
-        
-        query_params = {
-            "query_embeddings": [query_embedding],
-            "n_results": n_results,
-            "include": ['documents', 'metadatas'] # Include metadatas for debugging/verification
-        }
-
-        # Handle simple equality filters. For complex filters like $or, $in, this would need enhancement.
+        filter_json = None
+        # Passed through as a Chroma `where` clause: plain equality and the $or/$and/$in/$ne operators all work,
+        # in Chroma and in the in-process search (_metadata_matches).
         if filter_metadata and isinstance(filter_metadata, dict):
-            # Basic check for $or - if found, this basic filter won't work as ChromaDB expects specific structure.
-            if "$or" in filter_metadata or "$and" in filter_metadata:
-                print(f"RAG WARNING: Complex filter operators like $or, $and received ({filter_metadata}), "
-                      "but current query_relevant_log_chunks handles simple equality filters. "
-                      "This filter might not work as expected. Consider enhancing for ChromaDB operators "
-                      "or simplifying the filter in the calling code (e.g., app.py).")
-                # For now, we will pass it as is, but ChromaDB might error or ignore it if not structured correctly.
-                # A robust solution would parse filter_metadata and build the correct ChromaDB 'where' clause.
-                # If app.py sends a simple filter like {"entry_type": "emotion_log"}, it will work.
-                query_params["where"] = filter_metadata
-            else: # Simple key-value filter
-                 query_params["where"] = filter_metadata
-            print(f"RAG Query: Using metadata filter: {query_params['where']}")
-        
-        results = vector_collection_instance.query(**query_params)
-
-        if results and results.get('documents') and results['documents'][0]:
-            print(f"RAG Query: Found {len(results['documents'][0])} relevant chunks for query '{query_text[:50]}...'")
-            # print(f"DEBUG RAG: Metadatas of retrieved chunks: {results.get('metadatas',[[]])[0]}") # For debugging
-            return results['documents'][0] 
-        else:
-            print(f"RAG Query: No relevant chunks found for query '{query_text[:50]}...' (with current filters).")
-            return []
+            # Serialized with sorted keys so equal filters share one cache slot
+            filter_json = json.dumps(filter_metadata, sort_keys=True)
+
+        if query_embedding is not None:
+            query_embedding = tuple(query_embedding) # Hashable for the LRU key; same text -> same vector, so hit rates are unchanged
+        documents, metadatas = _cached_query(query_text, filter_json, n_results, max_tokens, query_embedding)
+        if with_metadata:
+            return [(document, dict(metadata or {})) for document, metadata in zip(documents, metadatas)] # Copies: the cached dicts stay untouched
+        return list(documents)
     except Exception as e:
         print(f"RAG: Error during query_relevant_log_chunks: {e}")
         return []
 
-def batch_index_all_logs():
+def _encode_bulk(chunks):
+    """Normalized embeddings for a bulk indexing run, as a float32 array; uses a CPU process pool when configured."""
+    if ENCODE_PROCESSES > 1 and len(chunks) >= MULTI_PROCESS_MIN_CHUNKS and embedding_model_instance.device.type == "cpu":
+        print(f"Batch Indexing: Encoding with {ENCODE_PROCESSES} CPU worker processes...")
+        pool = embedding_model_instance.start_multi_process_pool(["cpu"] * ENCODE_PROCESSES)
+        try:
+            return embedding_model_instance.encode_multi_process(chunks, pool, batch_size=EMBED_BATCH_SIZE, normalize_embeddings=True).astype(np.float32, copy=False)
+        finally:
+            embedding_model_instance.stop_multi_process_pool(pool)
+    return embedding_model_instance.encode(chunks, batch_size=EMBED_BATCH_SIZE, show_progress_bar=True, normalize_embeddings=True).astype(np.float32, copy=False)
+
+def _existing_chunk_ids(chunk_ids):
+    """The subset of chunk_ids already stored in the collection (looked up in Chroma-sized slices, ids only)."""
+    existing = set()
+    for start in range(0, len(chunk_ids), CHROMA_ADD_BATCH_SIZE):
+        existing.update(vector_collection_instance.get(ids=chunk_ids[start:start + CHROMA_ADD_BATCH_SIZE], include=[])["ids"])
+    return existing
+
+CHUNK_ID_PATTERN = re.compile(r".+:\d+") # "<entry_id>:<chunk position>", see _build_chunk_records
+
+def _delete_legacy_chunk_ids():
+    """
+    Removes chunks stored under the random uuid4 ids older versions used: re-indexing would otherwise add every
+    chunk a second time under its deterministic id. Returns how many were deleted.
+    """
+    legacy_ids = []
+    offset = 0
+    while True:
+        page_ids = vector_collection_instance.get(limit=CHROMA_ADD_BATCH_SIZE, offset=offset, include=[])["ids"]
+        legacy_ids.extend(chunk_id for chunk_id in page_ids if not CHUNK_ID_PATTERN.fullmatch(chunk_id))
+        if len(page_ids) < CHROMA_ADD_BATCH_SIZE:
+            break
+        offset += CHROMA_ADD_BATCH_SIZE
+    for start in range(0, len(legacy_ids), CHROMA_ADD_BATCH_SIZE):
+        vector_collection_instance.delete(ids=legacy_ids[start:start + CHROMA_ADD_BATCH_SIZE])
+    if legacy_ids:
+        with _memory_index_lock:
+            _memory_index.update(state="unloaded", matrix=None, documents=[], metadatas=[], position_by_id={}, shards={})
+        _cached_query.cache_clear()
+    return len(legacy_ids)
+
+def batch_index_all_logs(force=False, rebuild=False):
+    """
+    Indexes every log entry. Chunk ids are deterministic and entries never change once written, so chunks already
+    in the collection are skipped without being embedded; force=True re-embeds everything (e.g. after changing the
+    embedding model or backend). rebuild=True first drops and re-creates the collection, which is the only way
+    to apply changed COLLECTION_METADATA (distance space, HNSW parameters) to an existing one.
+    """
+    global _indexed_chunk_total
     if not RAG_ENABLED or not initialize_rag_if_needed():
         print("Batch Indexing: RAG not enabled or components not ready. Aborting.")
         return
 
-    all_entries = load_data() 
-    print(f"Batch Indexing: Found {len(all_entries)} total entries in JSONL.")
-    if not all_entries: return
-
-    # Optional: Clear existing collection for a full fresh re-index
-    # choice = input(f"Clear collection '{COLLECTION_NAME}' before re-indexing? (yes/no): ").lower()
-    # if choice == 'yes':
-    #     try:
-    #         print(f"Batch Indexing: Deleting collection '{COLLECTION_NAME}'...")
-    #         vector_store_client_instance.delete_collection(name=COLLECTION_NAME)
-    #         global vector_collection_instance
-    #         vector_collection_instance = vector_store_client_instance.get_or_create_collection(name=COLLECTION_NAME) # Recreate
-    #         print("Batch Indexing: Collection deleted and re-created.")
-    #     except Exception as e:
-    #         print(f"Batch Indexing: Error managing collection: {e}. Continuing...")
-
+    # A process that already holds the log (the CLI) reuses it, cached _rag_chunks included; otherwise
+    # (batch_indexer.py) entries are streamed from disk and only the chunk records are kept.
+    all_entries = ENTRIES if _entries_loaded else iter_data()
+    entry_total = len(ENTRIES) if _entries_loaded else count_entries()
+    print(f"Batch Indexing: Found {entry_total} total entries in JSONL.")
+    if not entry_total: return
+
+    if rebuild:
+        try:
+            print(f"Batch Indexing: Re-creating collection '{COLLECTION_NAME}' with {COLLECTION_METADATA}...")
+            _recreate_collection()
+        except Exception as e:
+            print(f"Batch Indexing: Error re-creating collection: {e}. Aborting.")
+            return
+
+    else:
+        try:
+            deleted = _delete_legacy_chunk_ids()
+            if deleted:
+                print(f"Batch Indexing: Removed {deleted} chunks with pre-upsert (random) ids; they are re-indexed under deterministic ids.")
+        except Exception as e:
+            print(f"Batch Indexing: Could not remove chunks with old random ids ({e}); run `python batch_indexer.py --rebuild` to avoid duplicates.")
+
+    # Pass 1: chunk records for every entry. Pass 2: one encode() over all chunks (batched internally),
+    # then collection.add in slices that stay under Chroma's per-call limit.
+    all_chunks, all_metadatas, all_ids = [], [], []
     for i, entry in enumerate(all_entries):
-        print(f"Batch Indexing: Processing entry {i+1}/{len(all_entries)}, ID: {entry.get('entry_id', 'N/A')}")
-        _index_entry_for_rag(entry)
+        print(f"Batch Indexing: Processing entry {i+1}/{entry_total}, ID: {entry.get('entry_id', 'N/A')}")
+        chunks, metadatas, ids = _build_chunk_records(entry)
+        all_chunks.extend(chunks)
+        all_metadatas.extend(metadatas)
+        all_ids.extend(ids)
+
+    if all_chunks and not force:
+        try:
+            existing_ids = _existing_chunk_ids(all_ids)
+        except Exception as e:
+            print(f"Batch Indexing: Could not look up existing chunks, re-embedding all: {e}")
+            existing_ids = set()
+        if existing_ids:
+            keep = [position for position, chunk_id in enumerate(all_ids) if chunk_id not in existing_ids]
+            print(f"Batch Indexing: Skipping {len(all_ids) - len(keep)} chunks already in the collection.")
+            all_chunks = [all_chunks[position] for position in keep]
+            all_metadatas = [all_metadatas[position] for position in keep]
+            all_ids = [all_ids[position] for position in keep]
+
+    if all_chunks:
+        try:
+            print(f"Batch Indexing: Embedding {len(all_chunks)} chunks...")
+            embeddings = _encode_bulk(all_chunks)
+            for start in range(0, len(all_chunks), CHROMA_ADD_BATCH_SIZE):
+                end = start + CHROMA_ADD_BATCH_SIZE
+                vector_collection_instance.upsert(embeddings=embeddings[start:end], documents=all_chunks[start:end],
+                                                  metadatas=all_metadatas[start:end], ids=all_ids[start:end])
+            _upsert_memory_index(all_ids, embeddings, all_chunks, all_metadatas)
+            _cached_query.cache_clear()
+            _indexed_chunk_total += len(all_chunks)
+        except Exception as e:
+            print(f"Batch Indexing: Error while embedding/adding chunks: {e}")
     
     print("--- Batch Indexing Summary ---")
     if vector_collection_instance:
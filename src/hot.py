@@ -0,0 +1,78 @@
+# src/hot.py
+"""
+Pure helpers that run on every chat turn: the expert router and the fallback-context formatter.
+
+Kept free of Streamlit and I/O, and fully annotated, so the module can be compiled with mypyc:
+    pip install mypy && mypyc src/hot.py
+The compiled extension is picked up by `from src import hot` in place of this file; without it the
+plain Python module is used and behaviour is identical.
+"""
+import re
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+try:
+    import ahocorasick # Optional: pyahocorasick, a C automaton matching all router keywords in one pass
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Experts in priority order (more specific keywords first). Matching is plain substring, as before.
+ROUTER_KEYWORDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("academic_advisor_expert", ("academic", "study", "studies", "exam", "marks", "remedial", "os subject", "subject")), # New expert for your data
+    ("relationship_counselor_expert", ("girlfriend", "relationship", "conflict with", "argument with")), # New expert
+    ("emotion_reflection_expert", ("feel", "feeling", "emotion", "sad", "happy", "anxious", "stressed", "joyful", "disappointed")),
+    ("problem_solving_expert", ("problem", "solve", "issue", "task", "how to", "strategy", "difficult", "time management", "balance")), # "time management" and "balance" are good candidates for problem solving
+    ("leisure_activity_expert", ("trip", "travel", "friends", "flatmates", "waterpark", "cricket", "hobby", "sport")), # New expert for positive events
+)
+KEYWORD_TO_EXPERT: Dict[str, str] = {keyword: expert for expert, keywords in ROUTER_KEYWORDS for keyword in keywords}
+EXPERT_RANK: Dict[str, int] = {expert: rank for rank, (expert, _) in enumerate(ROUTER_KEYWORDS)}
+# A zero-width lookahead reports a match at every start position, so overlapping keywords are never skipped.
+ROUTER_PATTERN = re.compile("(?=(%s))" % "|".join(re.escape(keyword) for keyword in KEYWORD_TO_EXPERT))
+
+# Same keywords as ROUTER_PATTERN, each mapped to its expert's rank; the automaton also reports overlapping matches
+ROUTER_AUTOMATON: Any = None
+if AHOCORASICK_AVAILABLE:
+    ROUTER_AUTOMATON = ahocorasick.Automaton()
+    for _keyword, _expert in KEYWORD_TO_EXPERT.items():
+        ROUTER_AUTOMATON.add_word(_keyword, EXPERT_RANK[_expert])
+    ROUTER_AUTOMATON.make_automaton()
+
+# RAG metadata filter per expert. Your data has rich entry_type, let's use them!
+EXPERT_RAG_FILTERS: Dict[str, Optional[Dict[str, Any]]] = {
+    # For your data, "interpersonal_conflict" and "academic_setback" also carry strong emotions;
+    # broadening this needs an $or filter like the leisure one below.
+    "emotion_reflection_expert": {"entry_type": "emotion_log"},
+    "academic_advisor_expert": {"entry_type": "academic_setback"},
+    "relationship_counselor_expert": {"entry_type": "interpersonal_conflict"},
+    "problem_solving_expert": None, # No specific filter, will rely on semantic search across all types
+    "leisure_activity_expert": {"$or": [
+        {"entry_type": "social_event_travel"},
+        {"entry_type": "recreational_activity"},
+        {"entry_type": "hobby_sport"}
+    ]},
+    "general_assistant": None,
+}
+
+def _matched_ranks(query_lower: str) -> Iterable[int]:
+    if ROUTER_AUTOMATON is not None:
+        return (rank for _, rank in ROUTER_AUTOMATON.iter(query_lower))
+    return (EXPERT_RANK[KEYWORD_TO_EXPERT[match.group(1)]] for match in ROUTER_PATTERN.finditer(query_lower))
+
+def route_to_expert(user_query: str) -> str:
+    """
+    Determines which expert should handle the query based on keywords.
+    Returns the expert_type string.
+    """
+    best_expert: Optional[str] = None
+    best_rank = len(ROUTER_KEYWORDS)
+    for rank in _matched_ranks(user_query.lower()):
+        if rank < best_rank:
+            best_rank = rank
+            best_expert = ROUTER_KEYWORDS[rank][0]
+            if rank == 0:
+                break
+    return best_expert or "general_assistant" # Default
+
+def join_fallback_lines(entries: Iterable[Dict[str, Any]]) -> str:
+    """Joins the precomputed _fallback_line of each entry into the LLM fallback context."""
+    return "\n\n---\n\n".join(entry["_fallback_line"] for entry in entries)
@@ -1,13 +1,22 @@
 # src/llm_interaction.py
+import json
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
-from .config import GEMINI_API_KEY # Import your API key from config.py
+from .config import GEMINI_API_KEY, MIN_CONTEXT_CHARS_FOR_LLM # Import your API key from config.py
+from . import response_cache
+
+# Diagnostics go through logging (silent below WARNING unless the app configures it), not print on every call
+log = logging.getLogger(__name__)
 
 # --- Existing API Key and Model Initialization ---
 if not GEMINI_API_KEY:
-    print("DEBUG llm_interaction: CRITICAL - GEMINI_API_KEY is not loaded from config!")
+    log.critical("GEMINI_API_KEY is not loaded from config!")
     raise ValueError("GEMINI_API_KEY is missing. Cannot configure Gemini.")
 else:
-    print("DEBUG llm_interaction: GEMINI_API_KEY loaded successfully.")
+    log.debug("GEMINI_API_KEY loaded successfully.")
     genai.configure(api_key=GEMINI_API_KEY)
 
 MODEL_NAME_PRIMARY = 'gemini-1.5-flash-latest'
@@ -15,31 +24,93 @@ MODEL_NAME_FALLBACK = 'gemini-pro'
 model = None
 
 try:
-    print(f"DEBUG llm_interaction: Attempting to initialize model: {MODEL_NAME_PRIMARY}")
+    log.debug("Attempting to initialize model: %s", MODEL_NAME_PRIMARY)
     model = genai.GenerativeModel(MODEL_NAME_PRIMARY)
-    print(f"DEBUG llm_interaction: Successfully initialized model: {MODEL_NAME_PRIMARY}")
+    log.debug("Successfully initialized model: %s", MODEL_NAME_PRIMARY)
 except Exception as e:
-    print(f"DEBUG llm_interaction: Warning - Could not initialize '{MODEL_NAME_PRIMARY}'. Error: {e}")
-    print(f"DEBUG llm_interaction: Attempting to initialize fallback model: {MODEL_NAME_FALLBACK}")
+    log.warning("Could not initialize '%s'. Error: %s", MODEL_NAME_PRIMARY, e)
+    log.info("Attempting to initialize fallback model: %s", MODEL_NAME_FALLBACK)
     try:
         model = genai.GenerativeModel(MODEL_NAME_FALLBACK)
-        print(f"DEBUG llm_interaction: Successfully initialized fallback model: {MODEL_NAME_FALLBACK}")
+        log.info("Successfully initialized fallback model: %s", MODEL_NAME_FALLBACK)
     except Exception as e_pro:
-        print(f"DEBUG llm_interaction: CRITICAL - Failed to initialize any Gemini model. Primary Error: {e}, Fallback Error: {e_pro}")
+        log.critical("Failed to initialize any Gemini model. Primary Error: %s, Fallback Error: %s", e, e_pro)
 
-# --- Updated Expert Prompt Generation Function ---
-def get_expert_prompt(user_query, personal_context_string, expert_type="general_assistant"):
+# --- Retries for transient API errors (quota 429s, 503s, deadlines) ---
+try:
+    from google.api_core import exceptions as google_exceptions # Installed with google-generativeai
+    RETRYABLE_EXCEPTIONS = (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable, google_exceptions.DeadlineExceeded)
+except ImportError:
+    RETRYABLE_EXCEPTIONS = ()
+# Finish reasons as enum members, looked up once; they are IntEnums, so they also match plain ints
+try:
+    from google.ai.generativelanguage_v1beta.types import Candidate # Installed with google-generativeai
+    _FINISH_STOP, _FINISH_MAX_TOKENS, _FINISH_SAFETY = Candidate.FinishReason.STOP, Candidate.FinishReason.MAX_TOKENS, Candidate.FinishReason.SAFETY
+except ImportError:
+    _FINISH_STOP, _FINISH_MAX_TOKENS, _FINISH_SAFETY = 1, 2, 3
+_FINISH_WITH_TEXT = frozenset((_FINISH_STOP, _FINISH_MAX_TOKENS))
+GENERATE_MAX_ATTEMPTS = 5
+RETRY_INITIAL_DELAY_SECONDS = 0.5 # Doubled after every failed attempt (0.5, 1, 2, 4 s), plus jitter
+RETRY_MAX_DELAY_SECONDS = 8.0 # Someone is waiting on the answer, so a single wait stays short
+
+def _retry_after_seconds(error):
+    """Server-suggested wait for a rate-limited call: a RetryInfo detail or a Retry-After header, if present."""
+    for detail in getattr(error, "details", None) or []:
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None:
+            return retry_delay.seconds + retry_delay.nanos / 1e9
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    try:
+        return float(retry_after) if retry_after else None
+    except ValueError: # HTTP-date form; fall back to our own backoff
+        return None
+
+def _generate_with_backoff(prompt, **kwargs):
+    """model.generate_content with exponential backoff on transient errors; other errors, and the last one, propagate."""
+    delay = RETRY_INITIAL_DELAY_SECONDS
+    for attempt in range(1, GENERATE_MAX_ATTEMPTS + 1):
+        try:
+            return model.generate_content(prompt, **kwargs)
+        except RETRYABLE_EXCEPTIONS as e:
+            if attempt == GENERATE_MAX_ATTEMPTS:
+                raise
+            wait_seconds = min(_retry_after_seconds(e) or delay + random.uniform(0, delay / 2), RETRY_MAX_DELAY_SECONDS)
+            log.warning("Transient API error (attempt %d/%d), retrying in %.1fs: %s", attempt, GENERATE_MAX_ATTEMPTS, wait_seconds, e)
+            time.sleep(wait_seconds)
+            delay = min(delay * 2, RETRY_MAX_DELAY_SECONDS)
+
+# --- Connection warmup (lets the first retrieval step overlap with transport setup) ---
+# count_tokens is a billed API request, so this runs once per process: the client keeps the channel open afterwards
+_warmup_started = False
+
+def warmup():
     """
-    Generates a specialized prompt based on the expert_type.
+    Opens the Gemini client channel with a cheap count_tokens call (no generation), so the first
+    generate_content doesn't pay connection setup. Only the first call does anything; never raises.
     """
-    base_intro = "You are 'MyMind AI', a highly personalized AI assistant. Your primary goal is to help the user based EXCLUSIVELY on THEIR OWN past experiences, thoughts, and reflections provided in the 'PERSONAL CONTEXT' section."
-    context_section = f"""
---- PERSONAL CONTEXT START ---
-{personal_context_string}
---- PERSONAL CONTEXT END ---
-"""
-    user_query_section = f"User's current query or situation: \"{user_query}\""
-    general_instructions = """
+    global _warmup_started
+    if model is None or _warmup_started:
+        return
+    _warmup_started = True
+    try:
+        model.count_tokens("ping")
+    except Exception as e:
+        log.debug("Warmup call failed (ignored): %s", e)
+
+# Long-lived so callers never join the warmup: the reply can start streaming while count_tokens is still in flight
+_warmup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-warmup")
+
+def start_warmup():
+    """Runs warmup() in the background and returns at once; a no-op after the first call."""
+    if not _warmup_started:
+        _warmup_executor.submit(warmup)
+
+
+# --- Updated Expert Prompt Generation Function ---
+# Every prompt piece except the personal context and the query is fixed per expert, so it is assembled once here.
+_BASE_INTRO = "You are 'MyMind AI', a highly personalized AI assistant. Your primary goal is to help the user based EXCLUSIVELY on THEIR OWN past experiences, thoughts, and reflections provided in the 'PERSONAL CONTEXT' section."
+_GENERAL_INSTRUCTIONS = """
 1.  Acknowledge the user's current query/feeling.
 2.  If relevant entries exist in the PERSONAL CONTEXT that mirror the current situation or emotion,
     gently remind the user of those past experiences and specifically what they learned or
@@ -51,74 +122,114 @@ def get_expert_prompt(user_query, personal_context_string, expert_type="general_
 5.  Maintain a supportive, empathetic, and reflective tone. Sound like a wise extension of the user's own mind.
 6.  Do NOT provide generic advice or information from outside the PERSONAL CONTEXT. Your knowledge is limited to what the user has shared with you in their logs. If the context does not contain relevant information, state that clearly.
 """
-
-    expert_specific_instructions = ""
-    if expert_type == "emotion_reflection_expert":
-        expert_specific_instructions = f"""
+_EXPERT_INSTRUCTIONS = {
+    "emotion_reflection_expert": """
 You are currently acting as the 'Emotion Reflection Specialist'. Your specific instructions:
 - Deeply analyze the user's stated emotion in their query.
 - Search the PERSONAL CONTEXT for entries detailing similar emotions, triggers, or past coping mechanisms.
 - Help the user explore their current feelings by comparing them to past documented experiences.
 - Highlight any patterns in emotional responses or effective strategies they've noted before.
-- If they are feeling overwhelmed, gently guide them based on what helped them in the past context."""
-    elif expert_type == "problem_solving_expert":
-        expert_specific_instructions = f"""
+- If they are feeling overwhelmed, gently guide them based on what helped them in the past context.""",
+    "problem_solving_expert": """
 You are currently acting as the 'Problem-Solving Strategist'. Your specific instructions:
 - Clearly identify the problem the user is trying to solve from their query (e.g., time management, balancing demands).
 - Search the PERSONAL CONTEXT for logs related to similar problems, challenges, or tasks.
 - Remind the user of strategies they used in the past, noting what was effective or ineffective as per their logs.
 - If they are stuck, help them break down the current problem and see if past learnings from the context can be applied.
-- Encourage a structured approach to the problem based on their own successful methods."""
-    elif expert_type == "academic_advisor_expert": # NEW EXPERT
-        expert_specific_instructions = f"""
+- Encourage a structured approach to the problem based on their own successful methods.""",
+    "academic_advisor_expert": """
 You are currently acting as the 'Academic Advisor Specialist'. Your specific instructions:
 - Focus on queries related to studies, exams, marks, subjects (like OS), and academic performance.
 - Search the PERSONAL CONTEXT for logs about academic challenges, study habits, successes, and setbacks.
 - Help the user understand their academic patterns, what study strategies worked or didn't, and how they coped with academic stress or disappointment previously.
-- If they mention low marks or remedial classes, refer to context about past similar situations and what they learned or planned to do."""
-    elif expert_type == "relationship_counselor_expert": # NEW EXPERT
-        expert_specific_instructions = f"""
+- If they mention low marks or remedial classes, refer to context about past similar situations and what they learned or planned to do.""",
+    "relationship_counselor_expert": """
 You are currently acting as the 'Relationship Counselor Specialist'. Your specific instructions:
 - Focus on queries related to interpersonal relationships, particularly with 'girlfriend', conflicts, arguments, or managing relationship expectations.
 - Search the PERSONAL CONTEXT for logs about relationship dynamics, communication patterns, conflict resolution attempts, and feelings about relationships.
-- Help the user reflect on their role in conflicts, past successful communication, or ways they've balanced relationship needs with other demands (like studies), based on their own logs."""
-    elif expert_type == "leisure_activity_expert": # NEW EXPERT
-        expert_specific_instructions = f"""
+- Help the user reflect on their role in conflicts, past successful communication, or ways they've balanced relationship needs with other demands (like studies), based on their own logs.""",
+    "leisure_activity_expert": """
 You are currently acting as the 'Leisure and Well-being Specialist'. Your specific instructions:
 - Focus on queries related to hobbies, travel, social events, sports (like cricket), fun activities, and relaxation.
 - Search the PERSONAL CONTEXT for logs describing enjoyable experiences, sources of joy, stress relief, and positive social interactions.
 - Remind the user of what activities they've found fulfilling, joyful, or motivating in the past.
-- If the user is feeling stressed or unmotivated, you might suggest reflecting on how past leisure activities (from context) impacted their well-being."""
-    else: # Default general_assistant
-        expert_type = "general_assistant" # Ensure it's set for the prompt message
-        expert_specific_instructions = "You are acting as the general AI assistant, ready to help with a variety of reflections based on the user's logs."
+- If the user is feeling stressed or unmotivated, you might suggest reflecting on how past leisure activities (from context) impacted their well-being.""",
+    "general_assistant": "You are acting as the general AI assistant, ready to help with a variety of reflections based on the user's logs.",
+}
 
-    return f"""
-{base_intro}
-{expert_specific_instructions}
+def _prompt_frame(expert_type):
+    """(text before the personal context, text after the user query) for one expert."""
+    head = f"\n{_BASE_INTRO}\n{_EXPERT_INSTRUCTIONS[expert_type]}\n\n\n--- PERSONAL CONTEXT START ---\n"
+    tail = f"\"\n\n{_GENERAL_INSTRUCTIONS}\nYour thoughtful response as the {expert_type.replace('_', ' ').title()}:\n"
+    return head, tail
 
-{context_section}
-{user_query_section}
+_PROMPT_FRAMES = {expert: _prompt_frame(expert) for expert in _EXPERT_INSTRUCTIONS}
 
-{general_instructions}
-Your thoughtful response as the {expert_type.replace('_', ' ').title()}:
-"""
+def get_expert_prompt(user_query, personal_context_string, expert_type="general_assistant"):
+    """
+    Generates a specialized prompt based on the expert_type.
+    """
+    head, tail = _PROMPT_FRAMES.get(expert_type, _PROMPT_FRAMES["general_assistant"]) # Unknown experts get the general prompt
+    return "".join((head, personal_context_string,
+                    "\n--- PERSONAL CONTEXT END ---\n\nUser's current query or situation: \"", user_query, tail))
+
+# With (almost) no personal context, instruction 4 makes Gemini say it lacks information anyway; say it without the call
+INSUFFICIENT_CONTEXT_RESPONSE = ("I don't have enough past information from your logs yet to provide a deep insight here. "
+                                 "Try logging a few reflections about this topic first.")
+
+def _has_enough_context(personal_context_string):
+    return bool(personal_context_string) and len(personal_context_string.strip()) >= MIN_CONTEXT_CHARS_FOR_LLM
 
 # --- Modified get_ai_response Function (structure remains the same, uses the updated get_expert_prompt) ---
-def get_ai_response(user_query, personal_context_string, expert_type="general_assistant"):
+def get_ai_response(user_query, personal_context_string, expert_type="general_assistant", streaming_callback=None, status=None):
+    """
+    The reply to user_query as one string. Pass a dict as status to learn whether it is a finished answer:
+    status["complete"] is set to True only then, never for error/fallback text, so callers know what is safe to cache.
+    """
+    if status is not None:
+        status["complete"] = False
+    if streaming_callback is not None:
+        # Incremental delivery for callers that can't consume a generator (a console, an st.empty() placeholder):
+        # each text delta is handed to the callback as it arrives, and the full reply is returned at the end.
+        response_parts = []
+        for text_delta in stream_ai_response(user_query, personal_context_string, expert_type, status=status):
+            response_parts.append(text_delta)
+            streaming_callback(text_delta)
+        return "".join(response_parts)
+
+    if not _has_enough_context(personal_context_string):
+        log.debug("Context below %d chars; answering locally (EXPERT: %s).", MIN_CONTEXT_CHARS_FOR_LLM, expert_type)
+        return INSUFFICIENT_CONTEXT_RESPONSE
+
+    # Same expert, context and query as a recent call: return that answer without a Gemini round trip
+    cached_response = response_cache.lookup(expert_type, personal_context_string, user_query)
+    if cached_response is not None:
+        log.debug("Exact-match cache hit (EXPERT: %s).", expert_type)
+        if status is not None:
+            status["complete"] = True
+        return cached_response
+    response_text = _generate_ai_response(user_query, personal_context_string, expert_type)
+    # The unary path never mixes partial text with an error message, so the error prefixes identify failures
+    if not response_text.startswith(response_cache.UNCACHEABLE_PREFIXES):
+        response_cache.store(expert_type, personal_context_string, user_query, response_text)
+        if status is not None:
+            status["complete"] = True
+    return response_text
+
+def _generate_ai_response(user_query, personal_context_string, expert_type):
     if model is None:
-        print("DEBUG llm_interaction: CRITICAL - Gemini model was not initialized.")
+        log.error("Gemini model was not initialized.")
         return "My AI core (Gemini model) could not be initialized. Please check the startup logs for errors related to the API key or model availability."
 
     prompt = get_expert_prompt(user_query, personal_context_string, expert_type)
 
-    print(f"\nDEBUG llm_interaction: --- PROMPT (EXPERT: {expert_type}, first 1000 chars) ---")
-    print(prompt[:1000] + ("..." if len(prompt) > 1000 else ""))
-    print("DEBUG llm_interaction: --- END OF PROMPT SNIPPET ---\n")
+    if log.isEnabledFor(logging.DEBUG): # The snippet is only built when someone is reading it
+        log.debug("--- PROMPT (EXPERT: %s, first 1000 chars) ---\n%s%s\n--- END OF PROMPT SNIPPET ---",
+                  expert_type, prompt[:1000], "..." if len(prompt) > 1000 else "")
 
     response_text = None 
     try:
-        response = model.generate_content(prompt)
+        response = _generate_with_backoff(prompt)
 
         # print(f"DEBUG llm_interaction: Full API Response object received: {type(response)}")
         # if hasattr(response, 'text'): print(f"DEBUG llm_interaction: response.text (raw): '{response.text}'")
@@ -127,46 +238,134 @@ def get_ai_response(user_query, personal_context_string, expert_type="general_as
 
         if hasattr(response, 'candidates') and response.candidates:
             first_candidate = response.candidates[0]
-            current_finish_reason_value = 0 
-            if hasattr(first_candidate, 'finish_reason'): current_finish_reason_value = int(first_candidate.finish_reason)
+            finish_reason = getattr(first_candidate, 'finish_reason', 0)
             
             # (Your detailed response parsing and safety handling logic from previous version)
             # This should include handling for finish_reason values 1 (STOP), 2 (MAX_TOKENS), 3 (SAFETY), etc.
             # And extracting text from first_candidate.content.parts
             # For brevity, assuming your robust parsing is here. Simplified example:
-            if current_finish_reason_value == 1 or current_finish_reason_value == 2:  # STOP or MAX_TOKENS
+            if finish_reason in _FINISH_WITH_TEXT:
                 if hasattr(first_candidate.content, 'parts') and first_candidate.content.parts:
                     response_text = "".join(part.text for part in first_candidate.content.parts if hasattr(part, 'text'))
                 else: # Try direct text attribute of candidate content if parts not present
                     if hasattr(first_candidate.content, 'text') and first_candidate.content.text:
                          response_text = first_candidate.content.text
                     else:
-                        print(f"DEBUG llm_interaction: Candidate 0 - Finish reason OK, but no parts or direct text found in content.")
+                        log.debug("Candidate 0 - Finish reason OK, but no parts or direct text found in content.")
 
-            elif current_finish_reason_value == 3:  # SAFETY
+            elif finish_reason == _FINISH_SAFETY:
                 block_details = "Response blocked by safety filters. "
                 # ... (your detailed safety rating parsing) ...
                 response_text = f"I'm unable to provide a response for that query due to content safety guidelines. {block_details.strip()}"
             else: 
-                finish_reason_name = f"UNKNOWN_REASON_VALUE_{current_finish_reason_value}"
-                # ... (your logic to get finish_reason.name) ...
+                finish_reason_name = getattr(finish_reason, "name", None) or f"UNKNOWN_REASON_VALUE_{finish_reason}"
                 response_text = f"My AI core processed the request but stopped for the following reason: {finish_reason_name}."
         
         elif hasattr(response, 'text') and response.text: # Fallback for simpler non-candidate responses
-            print("DEBUG llm_interaction: Using top-level response.text as fallback (no candidates).")
+            log.debug("Using top-level response.text as fallback (no candidates).")
             response_text = response.text
         
         if response_text is not None and response_text.strip():
             # print(f"DEBUG llm_interaction: Final response text to be returned: '{response_text}'")
             return response_text
         else: # No usable text extracted
-            print("DEBUG llm_interaction: No usable text extracted from candidates or response_text is empty/None.")
+            log.warning("No usable text extracted from candidates or response_text is empty/None.")
             if hasattr(response, 'prompt_feedback') and response.prompt_feedback.block_reason:
                 # ... (your prompt_feedback handling) ...
                 return "My AI core could not process your request because the input was blocked."
             return "AI core responded, but no usable text was found. Please check logs."
 
     except Exception as e:
-        print(f"DEBUG llm_interaction: Exception during API call or response processing: {e}")
+        log.error("Exception during API call or response processing: %s", e)
         # ... (your detailed exception logging) ...
-        return "I'm sorry, I encountered an unexpected issue while trying to process your request with my AI core."
\ No newline at end of file
+        return "I'm sorry, I encountered an unexpected issue while trying to process your request with my AI core."
+
+
+# --- Streaming variant (same prompt, text yielded as Gemini produces it) ---
+def stream_ai_response(user_query, personal_context_string, expert_type="general_assistant", status=None):
+    """
+    Generator version of get_ai_response for incremental display (e.g. st.write_stream).
+    Yields text deltas; on failure it yields the same user-facing messages get_ai_response returns, possibly after
+    partial text. status (a dict) works as in get_ai_response: "complete" turns True only once a full answer was yielded.
+    """
+    if status is not None:
+        status["complete"] = False
+    if not _has_enough_context(personal_context_string):
+        log.debug("Context below %d chars; answering locally (EXPERT: %s).", MIN_CONTEXT_CHARS_FOR_LLM, expert_type)
+        yield INSUFFICIENT_CONTEXT_RESPONSE
+        return
+
+    cached_response = response_cache.lookup(expert_type, personal_context_string, user_query)
+    if cached_response is not None: # Shares get_ai_response's exact-match cache; the whole answer arrives as one delta
+        log.debug("Exact-match cache hit (EXPERT: %s).", expert_type)
+        yield cached_response
+        if status is not None:
+            status["complete"] = True
+        return
+
+    if model is None:
+        log.error("Gemini model was not initialized.")
+        yield "My AI core (Gemini model) could not be initialized. Please check the startup logs for errors related to the API key or model availability."
+        return
+
+    prompt = get_expert_prompt(user_query, personal_context_string, expert_type)
+
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("--- STREAMING PROMPT (EXPERT: %s, first 1000 chars) ---\n%s%s\n--- END OF PROMPT SNIPPET ---",
+                  expert_type, prompt[:1000], "..." if len(prompt) > 1000 else "")
+
+    try:
+        response = _generate_with_backoff(prompt, stream=True) # Only the request is retried; a stream that fails midway is not replayed
+        response_parts = []
+        for chunk in response:
+            try:
+                chunk_text = chunk.text
+            except ValueError: # Chunk carries no text parts (e.g. a safety stop)
+                continue
+            if chunk_text:
+                response_parts.append(chunk_text)
+                yield chunk_text
+
+        if response_parts:
+            response_cache.store(expert_type, personal_context_string, user_query, "".join(response_parts))
+            if status is not None:
+                status["complete"] = True
+            return
+        if hasattr(response, 'candidates') and response.candidates and response.candidates[0].finish_reason == _FINISH_SAFETY:
+            yield "I'm unable to provide a response for that query due to content safety guidelines. Response blocked by safety filters."
+        elif hasattr(response, 'prompt_feedback') and response.prompt_feedback.block_reason:
+            yield "My AI core could not process your request because the input was blocked."
+        else:
+            log.warning("Stream finished without usable text.")
+            yield "AI core responded, but no usable text was found. Please check logs."
+
+    except Exception as e:
+        log.error("Exception during streaming API call: %s", e)
+        yield "I'm sorry, I encountered an unexpected issue while trying to process your request with my AI core."
+
+
+# --- Reminder wording (all tasks notified in one scheduler tick share a single request) ---
+_REMINDER_BATCH_SCHEMA = {"type": "object", "properties": {"messages": {"type": "array", "items": {"type": "string"}}}, "required": ["messages"]}
+
+def generate_reminder_messages_batch(tasks):
+    """
+    One short, friendly reminder message per task (dicts with 'title' and optional 'description'), in order,
+    from a single JSON-mode request. Returns [] if the model is unavailable or the reply can't be used.
+    """
+    if model is None or not tasks:
+        return []
+    task_list = [{"title": t.get("title", ""), "description": t.get("description") or ""} for t in tasks]
+    prompt = ("You are 'MyMind AI'. Write one short, warm reminder message (max 2 sentences) for each task below, "
+              "in the same order. Reply as JSON: {\"messages\": [...]} with exactly one string per task.\n\n"
+              f"TASKS:\n{json.dumps(task_list, ensure_ascii=False)}")
+    try:
+        response = _generate_with_backoff(prompt, generation_config={"response_mime_type": "application/json",
+                                                                     "response_schema": _REMINDER_BATCH_SCHEMA})
+        messages = json.loads(response.text).get("messages")
+    except Exception as e:
+        log.error("Exception while generating reminder messages: %s", e)
+        return []
+    if not isinstance(messages, list) or len(messages) != len(tasks):
+        log.warning("Reminder batch returned %s messages for %d tasks; ignoring.", len(messages) if isinstance(messages, list) else "no", len(tasks))
+        return []
+    return [str(m) for m in messages]
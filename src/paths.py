@@ -0,0 +1,4 @@
+# src/paths.py
+"""On-disk locations shared by modules that must not import each other (e.g. response_cache and data_manager)."""
+
+CHROMA_DB_PATH = "./chroma_db_store" # Chroma store; the response caches keep their files in subdirectories of it
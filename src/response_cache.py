@@ -0,0 +1,103 @@
+# src/response_cache.py
+"""
+Exact-match cache for AI responses, consulted by llm_interaction in front of every Gemini call. Keys are the expert
+plus hashes of the retrieved context and the query, so it runs after retrieval and still hits when the log grew
+but the context didn't change. Standard library only: it needs neither numpy, embeddings nor the vector store.
+"""
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .paths import CHROMA_DB_PATH
+
+CACHE_DIR = os.path.join(CHROMA_DB_PATH, "response_cache") # Its own directory, separate from semantic_cache's
+RESPONSES_PATH = os.path.join(CACHE_DIR, "exact_responses.json")
+MAX_RESPONSES = 128 # LRU bound
+RESPONSE_TTL_SECONDS = 3600 # Older answers are regenerated, so a repeated question eventually gets a fresh take
+SAVE_DELAY_SECONDS = 5.0 # Written this long after the first unsaved change (and at exit), not on every call
+
+# Fallback/error replies and the local not-enough-context reply from llm_interaction; these are never cached (here or in semantic_cache)
+UNCACHEABLE_PREFIXES = ("I'm sorry, I encountered", "I'm unable to provide", "My AI core", "AI core responded", "I don't have enough past information")
+
+_cache = {"loaded": False, "responses": {}, "dirty": False, "save_timer": None} # responses: key -> [stored_at, response]; dict order is LRU order (least recent first)
+_cache_lock = threading.Lock()
+
+
+def _key(expert_type, context_string, query_text):
+    context_hash = hashlib.sha1((context_string or "").encode("utf-8")).hexdigest()
+    query_hash = hashlib.sha1(query_text.encode("utf-8")).hexdigest()
+    return f"{expert_type}:{context_hash}:{query_hash}"
+
+def _load_if_needed():
+    if _cache["loaded"]:
+        return
+    _cache["loaded"] = True
+    try:
+        with open(RESPONSES_PATH, 'r', encoding='utf-8') as f:
+            _cache["responses"] = {key: value for key, value in json.load(f) if isinstance(value, list) and len(value) == 2}
+    except (OSError, ValueError) as e:
+        if os.path.exists(RESPONSES_PATH):
+            print(f"Response cache: Could not load {RESPONSES_PATH}, starting empty: {e}")
+
+def _save():
+    """Writes the cache to a temp file and swaps it in, so a crash or a second writer never leaves a truncated file."""
+    tmp_path = RESPONSES_PATH + ".tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(_cache["responses"].items()), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, RESPONSES_PATH)
+        return True
+    except OSError as e:
+        print(f"Response cache: Error saving to {RESPONSES_PATH}: {e}")
+        return False
+
+def _mark_dirty():
+    """Schedules a save; call with _cache_lock held after changing the cache."""
+    _cache["dirty"] = True
+    if _cache["save_timer"] is None:
+        timer = threading.Timer(SAVE_DELAY_SECONDS, _save_if_dirty)
+        timer.daemon = True # The atexit save below covers a timer that hasn't fired yet
+        _cache["save_timer"] = timer
+        timer.start()
+
+@atexit.register
+def _save_if_dirty():
+    with _cache_lock:
+        _cache["save_timer"] = None
+        if _cache["dirty"] and _save():
+            _cache["dirty"] = False
+
+
+def lookup(expert_type, context_string, query_text):
+    """Returns the response previously given for this exact expert/context/query combination, or None."""
+    key = _key(expert_type, context_string, query_text)
+    with _cache_lock:
+        _load_if_needed()
+        record = _cache["responses"].pop(key, None)
+        if record is None:
+            return None
+        if time.time() - record[0] > RESPONSE_TTL_SECONDS:
+            _mark_dirty() # Expired: already dropped by the pop above
+            return None
+        _cache["responses"][key] = record # Re-insert as most recently used
+        return record[1]
+
+def store(expert_type, context_string, query_text, response_text):
+    """Remembers a successful response for this exact expert/context/query combination."""
+    if not response_text or response_text.startswith(UNCACHEABLE_PREFIXES):
+        return
+    key = _key(expert_type, context_string, query_text)
+    with _cache_lock:
+        _load_if_needed()
+        responses = _cache["responses"]
+        responses.pop(key, None)
+        responses[key] = [time.time(), response_text]
+        while len(responses) > MAX_RESPONSES:
+            del responses[next(iter(responses))]
+        _mark_dirty()
@@ -1,17 +1,48 @@
 # src/scheduler_service.py
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timezone, timedelta
+import logging
 import time
 import os
 
 from . import task_manager # Import your task_manager
-# from . import llm_interaction # For generating reminder messages later
 # from . import notification_manager # For sending notifications later (Step future)
 
 scheduler = BackgroundScheduler(timezone=str(timezone.utc)) # Use string for timezone
+log = logging.getLogger(__name__) # Per-tick diagnostics; reminders themselves are always printed
+# Opt-in: word reminders with Gemini (one request per tick for all tasks, not one per task)
+LLM_REMINDER_MESSAGES = os.getenv("MYMIND_LLM_REMINDERS", "").lower() in ("1", "true", "yes")
+
+# (task_id, reason, reminder/due time) -> message: an overdue task is notified on every tick, but worded only once
+_reminder_message_cache = {}
+
+def _reminder_message_key(task_data):
+    return (task_data["task_id"], task_data["notify_reason"],
+            task_data.get("specific_reminder_time_for_notification") or task_data.get("due_at_utc"))
+
+def _reminder_messages_for(tasks_to_notify):
+    """Gemini-written messages aligned with tasks_to_notify, or [] when disabled or unavailable."""
+    global _reminder_message_cache
+    if not LLM_REMINDER_MESSAGES:
+        return []
+    keys = [_reminder_message_key(task_data) for task_data in tasks_to_notify]
+    # Only notifications still pending are kept, so the cache stays as small as one tick's list
+    message_cache = {key: _reminder_message_cache[key] for key in keys if key in _reminder_message_cache}
+    new_tasks = [task_data for key, task_data in zip(keys, tasks_to_notify) if key not in message_cache]
+    if new_tasks:
+        try:
+            from . import llm_interaction # Imported lazily: it configures Gemini and requires the API key
+        except Exception as e:
+            log.warning("LLM reminder messages unavailable: %s", e)
+            return []
+        # A failed batch is remembered as None too: those notifications stay plain instead of re-asking every tick
+        new_messages = llm_interaction.generate_reminder_messages_batch(new_tasks) or [None] * len(new_tasks)
+        message_cache.update(zip((_reminder_message_key(task_data) for task_data in new_tasks), new_messages))
+    _reminder_message_cache = message_cache
+    return [message_cache.get(key) for key in keys]
 
 # --- Notification Function (Basic Console Print for Now) ---
-def send_console_notification(task_title: str, reason: str, due_date_str: str | None, specific_reminder_time: str | None = None):
+def send_console_notification(task_title: str, reason: str, due_date_str: str | None, specific_reminder_time: str | None = None, ai_message: str | None = None):
     """Placeholder for sending notifications."""
     message = f"🔔 REMINDER ({reason.upper()}): '{task_title}'"
     if reason == "due" and due_date_str:
@@ -20,6 +51,8 @@ def send_console_notification(task_title: str, reason: str, due_date_str: str |
         message += f" (Reminder for {specific_reminder_time}, Due: {due_date_str if due_date_str else 'N/A'})."
     elif due_date_str : # general reminder if specific time not passed but reason is reminder
         message += f" (Due: {due_date_str})."
+    if ai_message:
+        message += f"\n   {ai_message}"
 
     print(f"\n{datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S %Z')} - {message}\n")
     # Later, this will call notification_manager.send_notification(...)
@@ -29,7 +62,7 @@ def check_for_reminders_and_due_tasks_job():
     """
     Job executed by the scheduler to check for tasks and send notifications.
     """
-    print(f"[{datetime.now(timezone.utc).strftime('%H:%M:%S')}] Scheduler: Checking for reminders and due tasks...")
+    log.debug("Scheduler: Checking for reminders and due tasks...")
     try:
         tasks_to_notify = task_manager.get_tasks_needing_reminders_or_due()
         
@@ -37,16 +70,16 @@ def check_for_reminders_and_due_tasks_job():
             # print(f"[{datetime.now(timezone.utc).strftime('%H:%M:%S')}] Scheduler: No tasks to notify.")
             return
 
-        for task_data in tasks_to_notify:
+        ai_messages = _reminder_messages_for(tasks_to_notify)
+        for i, task_data in enumerate(tasks_to_notify):
             task_id = task_data["task_id"]
             title = task_data["title"]
             reason = task_data["notify_reason"]
             due_date_str = task_data.get("due_at_utc")
             specific_reminder_time = task_data.get("specific_reminder_time_for_notification")
 
-            # Here you could use llm_interaction.generate_reminder_message(title, task_data.get("description"), relevant_context_from_rag)
-            # For now, direct notification:
-            send_console_notification(title, reason, due_date_str, specific_reminder_time)
+            send_console_notification(title, reason, due_date_str, specific_reminder_time,
+                                      ai_messages[i] if ai_messages else None) # None: plain notification
 
             # IMPORTANT: Update the task to prevent re-notification for the same reminder slot immediately.
             # This logic needs to be robust. For instance, if a reminder is for a specific time in
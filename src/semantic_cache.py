@@ -0,0 +1,137 @@
+# src/semantic_cache.py
+"""
+Semantic cache for AI responses: a rephrased question (query embedding cosine similarity >= SIMILARITY_THRESHOLD)
+routed to the same expert with the same RAG filter reuses the earlier answer, skipping retrieval and the LLM call.
+Answers are only reused while the log is unchanged, since a new entry can change the right answer.
+The cache is persisted next to the Chroma store; without numpy or RAG it is a no-op.
+
+The exact-match layer in front of every Gemini call lives in response_cache.
+"""
+import atexit
+import json
+import os
+import threading
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from . import data_manager
+from .response_cache import UNCACHEABLE_PREFIXES
+
+SIMILARITY_THRESHOLD = 0.92
+MAX_CACHED_RESPONSES = 512 # Oldest answers are dropped beyond this
+CACHE_DIR = os.path.join(data_manager.CHROMA_DB_PATH, "semantic_cache")
+# Embeddings and records share one file, so a torn write can never pair one version's rows with another's records
+CACHE_PATH = os.path.join(CACHE_DIR, "semantic_cache.npz")
+# Written SAVE_DELAY_SECONDS after the first unsaved store (and at exit), not on every chat turn
+SAVE_DELAY_SECONDS = 5.0
+
+
+_cache = {"loaded": False, "embeddings": None, "records": [], "dirty": False, "save_timer": None} # embeddings: float32 (N, dim), unit rows; records: parallel dicts
+_cache_lock = threading.Lock()
+
+
+def _filter_key(filter_metadata):
+    return json.dumps(filter_metadata, sort_keys=True) if filter_metadata else ""
+
+def _normalized_embedding(query_text, query_embedding=None):
+    embedding = query_embedding if query_embedding is not None else data_manager.embed_query(query_text)
+    if embedding is None:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+def _load_if_needed():
+    if _cache["loaded"]:
+        return
+    _cache["loaded"] = True
+    try:
+        with np.load(CACHE_PATH, allow_pickle=False) as saved:
+            records = json.loads(str(saved["records"]))
+            embeddings = saved["embeddings"]
+        if len(records) == len(embeddings):
+            _cache["records"], _cache["embeddings"] = records, embeddings
+    except (OSError, ValueError, KeyError) as e:
+        if os.path.exists(CACHE_PATH):
+            print(f"Semantic cache: Could not load {CACHE_PATH}, starting empty: {e}")
+
+def _save():
+    """Writes the cache to a temp file and swaps it in, so a crash or a second writer never leaves a truncated file."""
+    tmp_path = CACHE_PATH + ".tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, embeddings=_cache["embeddings"], records=np.array(json.dumps(_cache["records"])))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, CACHE_PATH)
+        return True
+    except OSError as e:
+        print(f"Semantic cache: Error saving to {CACHE_PATH}: {e}")
+        return False
+
+def _mark_dirty():
+    """Schedules a save; call with _cache_lock held after changing the cache."""
+    _cache["dirty"] = True
+    if _cache["save_timer"] is None:
+        timer = threading.Timer(SAVE_DELAY_SECONDS, _save_if_dirty)
+        timer.daemon = True # The atexit save below covers a timer that hasn't fired yet
+        _cache["save_timer"] = timer
+        timer.start()
+
+@atexit.register
+def _save_if_dirty():
+    with _cache_lock:
+        _cache["save_timer"] = None
+        if _cache["dirty"] and _save():
+            _cache["dirty"] = False
+
+
+def lookup(query_text, expert_type, filter_metadata=None, query_embedding=None):
+    """Returns a cached response for a semantically equivalent earlier query, or None."""
+    if not NUMPY_AVAILABLE:
+        return None
+    query_vector = _normalized_embedding(query_text, query_embedding)
+    if query_vector is None:
+        return None
+    filter_key = _filter_key(filter_metadata)
+    corpus_size = data_manager.count_entries()
+    with _cache_lock:
+        _load_if_needed()
+        if _cache["embeddings"] is None or not len(_cache["records"]):
+            return None
+        similarities = _cache["embeddings"] @ query_vector
+        for position in np.argsort(similarities)[::-1]:
+            if similarities[position] < SIMILARITY_THRESHOLD:
+                break
+            record = _cache["records"][position]
+            if record["expert_type"] == expert_type and record["filter_key"] == filter_key and record["corpus_size"] == corpus_size:
+                return record["response"]
+    return None
+
+def store(query_text, expert_type, filter_metadata, response_text, query_embedding=None):
+    """Remembers a successful response for later near-duplicate queries."""
+    if not NUMPY_AVAILABLE or not response_text or response_text.startswith(UNCACHEABLE_PREFIXES):
+        return
+    query_vector = _normalized_embedding(query_text, query_embedding)
+    if query_vector is None:
+        return
+    record = {
+        "query": query_text,
+        "expert_type": expert_type,
+        "filter_key": _filter_key(filter_metadata),
+        "corpus_size": data_manager.count_entries(),
+        "response": response_text,
+    }
+    with _cache_lock:
+        _load_if_needed()
+        if _cache["embeddings"] is None:
+            _cache["embeddings"] = query_vector[np.newaxis, :]
+        else:
+            _cache["embeddings"] = np.vstack([_cache["embeddings"], query_vector])[-MAX_CACHED_RESPONSES:]
+        _cache["records"] = (_cache["records"] + [record])[-MAX_CACHED_RESPONSES:]
+        _mark_dirty()
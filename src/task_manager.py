@@ -1,38 +1,183 @@
+import atexit
 import json
+import threading
 import uuid
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
 import os
 
+try:
+    import orjson # Optional: C-level JSON (de)serialization, as in data_manager
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 TASKS_DATA_FILE = "tasks_data.jsonl"
+# Tasks are kept in memory and written back TASKS_FLUSH_DELAY_SECONDS after the first unsaved change (and at exit),
+# so a scheduler tick or a burst of updates doesn't re-read and rewrite the whole file per call.
+TASKS_FLUSH_DELAY_SECONDS = 5.0
+INACTIVE_TASK_STATUSES = ("completed", "cancelled")
+# The file is an append-only log: a write-back appends one record per changed task, and the file is rewritten
+# as one line per live task once it holds more than TASKS_COMPACT_RATIO records per task (and at least TASKS_COMPACT_MIN_RECORDS).
+TASKS_COMPACT_RATIO = 2
+TASKS_COMPACT_MIN_RECORDS = 64
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers only need to catch the latter
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+def _json_dumps_line(obj) -> bytes:
+    """One JSONL record as UTF-8 bytes, newline included."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj) + '\n').encode('utf-8')
+
+def _task_for_file(task: dict) -> dict:
+    return {key: value for key, value in task.items() if not key.startswith("_")} # Without the in-memory "_" fields (parsed datetimes)
 
-def _load_tasks_from_file() -> list[dict]:
-    """Loads all tasks from the JSONL data file."""
+def _load_tasks_from_file() -> tuple[list[dict], int]:
+    """
+    Replays the JSONL data file into the live tasks, in first-seen order; also returns the number of records read.
+    A line is either a plain task (what compaction writes) or an {"op": "upsert"/"delete", ...} record.
+    """
     if not os.path.exists(TASKS_DATA_FILE):
-        return []
-    tasks = []
+        return [], 0
+    tasks_by_id = {}
+    record_count = 0
     try:
-        with open(TASKS_DATA_FILE, 'r', encoding='utf-8') as f:
+        with open(TASKS_DATA_FILE, 'rb') as f:
             for line in f:
                 line_content = line.strip()
                 if line_content:
                     try:
-                        tasks.append(json.loads(line_content))
+                        record = _json_loads(line_content)
                     except json.JSONDecodeError:
-                        print(f"Warning: Skipping malformed JSON line in {TASKS_DATA_FILE}: {line_content[:100]}...")
+                        print(f"Warning: Skipping malformed JSON line in {TASKS_DATA_FILE}: {line_content[:100].decode('utf-8', 'replace')}...")
+                        continue
+                    record_count += 1
+                    op = record.get("op")
+                    if op == "delete":
+                        tasks_by_id.pop(record.get("task_id"), None)
+                    elif op == "upsert":
+                        task = record.get("task") or {}
+                        tasks_by_id[task.get("task_id")] = task
+                    else:
+                        tasks_by_id[record.get("task_id")] = record
     except Exception as e:
         print(f"Error loading tasks from {TASKS_DATA_FILE}: {e}")
-    return tasks
+    return list(tasks_by_id.values()), record_count
 
-def _save_tasks_to_file(tasks: list[dict]):
-    """Saves all tasks to the JSONL data file, overwriting it."""
+def _save_tasks_to_file(tasks: list[dict]) -> bool:
+    """Saves all tasks to the JSONL data file, replacing it (written to a temp file, fsynced, then swapped in)."""
+    tmp_path = TASKS_DATA_FILE + ".tmp"
     try:
-        with open(TASKS_DATA_FILE, 'w', encoding='utf-8') as f:
-            for task in tasks:
-                f.write(json.dumps(task) + '\n')
+        with open(tmp_path, 'wb') as f:
+            f.write(b"".join(_json_dumps_line(_task_for_file(task)) for task in tasks))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, TASKS_DATA_FILE)
+        return True
     except Exception as e:
         print(f"Error saving tasks to {TASKS_DATA_FILE}: {e}")
+        return False
 
+def _append_ops(op_records: list[dict]) -> int | None:
+    """Appends upsert/delete records to the JSONL data file; returns the bytes written, None on error. Not fsynced; compaction is."""
+    data = b"".join(_json_dumps_line(op_record) for op_record in op_records)
+    try:
+        with open(TASKS_DATA_FILE, 'ab') as f:
+            f.write(data)
+        return len(data)
+    except Exception as e:
+        print(f"Error appending to {TASKS_DATA_FILE}: {e}")
+        return None
 
+
+# --- Shared in-memory task list (the scheduler thread and the caller's thread both use it) ---
+# by_id: task_id -> the same dict as in tasks; active: the same for tasks not in INACTIVE_TASK_STATUSES, in file order;
+# changed: ids added/updated/deleted since the last write-back; record_count: records currently in the file
+_tasks_state = {"tasks": None, "by_id": {}, "active": {}, "file_key": None, "changed": {}, "record_count": 0, "flush_timer": None}
+_tasks_lock = threading.RLock()
+
+def _tasks_file_key():
+    try:
+        stat = os.stat(TASKS_DATA_FILE)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _attach_parsed_times(task: dict) -> dict:
+    """Caches the task's timestamps as datetimes in "_" fields, so the scheduler tick only compares. Never saved."""
+    task["_due_at_dt"] = _ensure_utc(task.get("due_at_utc"))
+    task["_reminders_dt"] = [_ensure_utc(reminder_str) for reminder_str in task.get("reminder_at_utc_list", [])]
+    task["_last_reminded_dt"] = _ensure_utc(task.get("last_reminded_at_utc"))
+    return task
+
+def _get_tasks_cached() -> list[dict]:
+    """
+    The in-memory task list; call with _tasks_lock held. Loaded on first use, and reloaded when another
+    process (e.g. the CLI next to the web app) has written the file and there are no unsaved local changes.
+    """
+    file_key = _tasks_file_key()
+    if _tasks_state["tasks"] is None or (not _tasks_state["changed"] and file_key != _tasks_state["file_key"]):
+        _reload_tasks(file_key)
+    return _tasks_state["tasks"]
+
+def _reload_tasks(file_key):
+    """Replaces the in-memory state with a replay of the file, whose key (before reading) is file_key."""
+    tasks, _tasks_state["record_count"] = _load_tasks_from_file()
+    _tasks_state["tasks"] = [_attach_parsed_times(task) for task in tasks]
+    _tasks_state["by_id"] = {task.get("task_id"): task for task in _tasks_state["tasks"]}
+    _tasks_state["active"] = {task_id: task for task_id, task in _tasks_state["by_id"].items() if task.get("status") not in INACTIVE_TASK_STATUSES}
+    _tasks_state["file_key"] = file_key
+
+def _mark_dirty(task_id: str):
+    """Schedules a write-back of the task; call with _tasks_lock held after adding, changing or deleting it."""
+    _tasks_state["changed"][task_id] = True
+    if _tasks_state["flush_timer"] is None:
+        timer = threading.Timer(TASKS_FLUSH_DELAY_SECONDS, _flush_if_dirty)
+        timer.daemon = True # The atexit flush below covers a timer that hasn't fired yet
+        _tasks_state["flush_timer"] = timer
+        timer.start()
+
+def _maybe_compact():
+    """Rewrites the log as one line per live task once stale records dominate it; call with _tasks_lock held."""
+    record_count = _tasks_state["record_count"]
+    if record_count >= TASKS_COMPACT_MIN_RECORDS and record_count > TASKS_COMPACT_RATIO * len(_tasks_state["tasks"]):
+        # The rewrite is built from memory, so first pick up anything another process appended since our last read
+        file_key = _tasks_file_key()
+        if file_key != _tasks_state["file_key"]:
+            _reload_tasks(file_key)
+        if _save_tasks_to_file(_tasks_state["tasks"]):
+            _tasks_state["record_count"] = len(_tasks_state["tasks"])
+        _tasks_state["file_key"] = _tasks_file_key()
+
+@atexit.register
+def _flush_if_dirty():
+    with _tasks_lock:
+        _tasks_state["flush_timer"] = None
+        if not _tasks_state["changed"]:
+            return
+        by_id = _tasks_state["by_id"]
+        # One record per changed task, with its current state: a burst of updates to a task costs one line
+        op_records = [{"op": "upsert", "task": _task_for_file(by_id[task_id])} if task_id in by_id else {"op": "delete", "task_id": task_id}
+                      for task_id in _tasks_state["changed"]]
+        file_key_before = _tasks_file_key()
+        bytes_written = _append_ops(op_records)
+        if bytes_written is not None:
+            _tasks_state["changed"] = {}
+            _tasks_state["record_count"] += len(op_records)
+            file_key = _tasks_file_key()
+            # Only our append since the last read (the size grew by exactly our bytes): memory matches the file.
+            # Otherwise another process (CLI or web app) wrote too; replay the file so its records aren't lost
+            # (ours were appended after them, so our changes still win for the tasks we touched).
+            if file_key_before == _tasks_state["file_key"] and file_key and file_key[1] == (file_key_before[1] if file_key_before else 0) + bytes_written:
+                _tasks_state["file_key"] = file_key
+            else:
+                _reload_tasks(file_key)
+            _maybe_compact()
+
+
+@lru_cache(maxsize=4096) # Pure per string, and the scheduler re-parses the same few timestamps every tick
 def _ensure_utc(dt_str: str | None) -> datetime | None:
     """
     Converts an ISO string to a timezone-aware UTC datetime object.
@@ -72,7 +217,6 @@ def add_task(title: str,
     Adds a new task to the system.
     due_at_utc_str should be in ISO format (e.g., "2025-12-31T14:30:00Z"or "2025-12-31T14:30:00+00:00").
     """
-    tasks = _load_tasks_from_file()
     task_id = str(uuid.uuid4())
     created_at_utc_dt = datetime.now(timezone.utc)
     created_at_utc_iso = created_at_utc_dt.isoformat()
@@ -97,42 +241,49 @@ def add_task(title: str,
         "project_tags": project_tags if project_tags else [],
         "last_reminded_at_utc": None # To track if a specific reminder_at_utc was processed
     }
-    tasks.append(new_task)
-    _save_tasks_to_file(tasks)
+    with _tasks_lock:
+        _get_tasks_cached().append(_attach_parsed_times(new_task))
+        _tasks_state["by_id"][task_id] = new_task
+        if status not in INACTIVE_TASK_STATUSES:
+            _tasks_state["active"][task_id] = new_task
+        _mark_dirty(task_id)
     print(f"Task '{title}' (ID: {task_id}) added.")
-    return new_task
+    return _task_for_file(new_task) # Callers get copies without the "_" fields; the cached dicts only change through this module
 
 def get_task(task_id: str) -> dict | None:
     """Retrieves a specific task by its ID."""
-    tasks = _load_tasks_from_file()
-    for task in tasks:
-        if task.get("task_id") == task_id:
-            return task
-    return None
+    with _tasks_lock:
+        _get_tasks_cached()
+        task = _tasks_state["by_id"].get(task_id)
+        return _task_for_file(task) if task is not None else None
 
 def update_task(task_id: str, updates: dict) -> bool:
     """
     Updates specified fields of a task.
     """
-    tasks = _load_tasks_from_file()
-    task_found = False
-    for i, task in enumerate(tasks):
-        if task.get("task_id") == task_id:
+    with _tasks_lock:
+        _get_tasks_cached()
+        task = _tasks_state["by_id"].get(task_id)
+        task_found = task is not None
+        if task_found:
             for key, value in updates.items():
                 if key == "due_at_utc" and isinstance(value, str):
                     dt_obj = _ensure_utc(value)
-                    tasks[i][key] = dt_obj.isoformat() if dt_obj else None
+                    task[key] = dt_obj.isoformat() if dt_obj else None
                 elif key == "reminder_at_utc_list" and isinstance(value, list):
-                    tasks[i][key] = [_ensure_utc(dt_str).isoformat() for dt_str in value if _ensure_utc(dt_str)]
+                    task[key] = [_ensure_utc(dt_str).isoformat() for dt_str in value if _ensure_utc(dt_str)]
                 elif key == "last_reminded_at_utc" and isinstance(value, str): # Ensure it's stored as standard ISO
                     dt_obj = _ensure_utc(value)
-                    tasks[i][key] = dt_obj.isoformat() if dt_obj else None
+                    task[key] = dt_obj.isoformat() if dt_obj else None
                 else:
-                    tasks[i][key] = value
-            task_found = True
-            break
+                    task[key] = value
+            _attach_parsed_times(task)
+            if task.get("status") in INACTIVE_TASK_STATUSES:
+                _tasks_state["active"].pop(task_id, None)
+            else:
+                _tasks_state["active"].setdefault(task_id, task)
+            _mark_dirty(task_id)
     if task_found:
-        _save_tasks_to_file(tasks)
         print(f"Task '{task_id}' updated.")
         return True
     print(f"Task '{task_id}' not found for update.")
@@ -141,11 +292,15 @@ def update_task(task_id: str, updates: dict) -> bool:
 
 def delete_task(task_id: str) -> bool:
     """Deletes a task by its ID."""
-    tasks = _load_tasks_from_file()
-    original_len = len(tasks)
-    tasks = [task for task in tasks if task.get("task_id") != task_id]
-    if len(tasks) < original_len:
-        _save_tasks_to_file(tasks)
+    with _tasks_lock:
+        tasks = _get_tasks_cached()
+        task = _tasks_state["by_id"].pop(task_id, None)
+        _tasks_state["active"].pop(task_id, None)
+        deleted = task is not None
+        if deleted:
+            tasks.remove(task) # Still a list scan, but deletes are rare next to lookups and updates
+            _mark_dirty(task_id)
+    if deleted:
         print(f"Task '{task_id}' deleted.")
         return True
     print(f"Task '{task_id}' not found for deletion.")
@@ -153,8 +308,9 @@ def delete_task(task_id: str) -> bool:
 
 def get_pending_tasks() -> list[dict]:
     """Returns all tasks that are not 'completed' or 'cancelled'."""
-    tasks = _load_tasks_from_file()
-    return [task for task in tasks if task.get("status") not in ["completed", "cancelled"]]
+    with _tasks_lock:
+        _get_tasks_cached()
+        return [_task_for_file(task) for task in _tasks_state["active"].values()] # Maintained on every change; no scan over finished tasks
 
 def get_tasks_needing_reminders_or_due(current_time_utc: datetime | None = None) -> list[dict]:
     """
@@ -163,14 +319,19 @@ def get_tasks_needing_reminders_or_due(current_time_utc: datetime | None = None)
     if current_time_utc is None:
         current_time_utc = datetime.now(timezone.utc)
     
-    pending_tasks = get_pending_tasks()
+    with _tasks_lock: # Reads the internal records, for their parsed "_" datetimes; callers only get copies built below
+        _get_tasks_cached()
+        return _collect_notifications(_tasks_state["active"].values(), current_time_utc)
+
+def _collect_notifications(pending_tasks, current_time_utc: datetime) -> list[dict]:
+    """Copies of the pending tasks that need a notification at current_time_utc; call with _tasks_lock held."""
     tasks_to_notify = []
 
     for task in pending_tasks:
         notify_reason = None # "due", "reminder"
         
         # Check for due
-        due_at = _ensure_utc(task.get("due_at_utc"))
+        due_at = task["_due_at_dt"] # Parsed once when the task was loaded/changed
         if due_at and due_at <= current_time_utc:
             notify_reason = "due"
             # You might want to avoid repeat "due" notifications if status isn't changing
@@ -183,19 +344,21 @@ def get_tasks_needing_reminders_or_due(current_time_utc: datetime | None = None)
         # For now, we check if any reminder_at_utc has passed and if task.last_reminded_at_utc is older.
         
         task_reminders_utc_str = task.get("reminder_at_utc_list", [])
-        last_reminded = _ensure_utc(task.get("last_reminded_at_utc"))
+        last_reminded = task["_last_reminded_dt"]
+        specific_reminder_time = None
 
-        for reminder_str in task_reminders_utc_str:
-            reminder_dt = _ensure_utc(reminder_str)
+        for reminder_str, reminder_dt in zip(task_reminders_utc_str, task["_reminders_dt"]):
             if reminder_dt and reminder_dt <= current_time_utc:
                 # If we haven't reminded for this specific reminder time, or if it's a general check
                 if not last_reminded or last_reminded < reminder_dt: # Basic check
                     notify_reason = "reminder"
-                    task["specific_reminder_time_for_notification"] = reminder_str # Add which reminder triggered
+                    specific_reminder_time = reminder_str # Which reminder triggered
                     break # Process one reminder trigger at a time for this task instance
         
         if notify_reason:
-            task_copy = task.copy() # Avoid modifying original list items directly
+            task_copy = _task_for_file(task) # Never modify the stored records; no "_" fields for callers
+            if specific_reminder_time:
+                task_copy["specific_reminder_time_for_notification"] = specific_reminder_time
             task_copy["notify_reason"] = notify_reason 
             tasks_to_notify.append(task_copy)
             
@@ -0,0 +1,23 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# The app runs from the repository root (`streamlit run app.py`, `python main.py`), importing the `src` package from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# src.config raises without a key; nothing in these tests reaches the Gemini API
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+
+@pytest.fixture
+def response_cache(tmp_path, monkeypatch):
+    """src.response_cache, empty and saving under tmp_path."""
+    from src import response_cache
+    monkeypatch.setattr(response_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(response_cache, "RESPONSES_PATH", str(tmp_path / "exact_responses.json"))
+    state = {"loaded": True, "responses": {}, "dirty": False, "save_timer": None}
+    monkeypatch.setattr(response_cache, "_cache", state)
+    yield response_cache
+    if state["save_timer"] is not None:
+        state["save_timer"].cancel()
@@ -0,0 +1,105 @@
+# tests/test_caches.py
+import pytest
+
+from src import llm_interaction
+
+CONTEXT = "Entry ID: 1, Type: academic_setback, Summary: failed the OS exam, Learnings: start earlier." # Above MIN_CONTEXT_CHARS_FOR_LLM
+ERROR_REPLY = "I'm sorry, I encountered an unexpected issue while trying to process your request with my AI core."
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+def _stream(*texts, error=None):
+    for text in texts:
+        yield _Chunk(text)
+    if error is not None:
+        raise error
+
+
+def test_response_cache_skips_error_replies(response_cache):
+    response_cache.store("general_assistant", CONTEXT, "q", ERROR_REPLY)
+    response_cache.store("general_assistant", CONTEXT, "q", "")
+    assert response_cache.lookup("general_assistant", CONTEXT, "q") is None
+    response_cache.store("general_assistant", CONTEXT, "q", "A real answer.")
+    assert response_cache.lookup("general_assistant", CONTEXT, "q") == "A real answer."
+    assert response_cache.lookup("emotion_reflection_expert", CONTEXT, "q") is None
+
+
+def test_response_cache_save_round_trip(response_cache):
+    response_cache.store("general_assistant", CONTEXT, "q", "A real answer.")
+    response_cache._save_if_dirty()
+    response_cache._cache.update(loaded=False, responses={})
+    assert response_cache.lookup("general_assistant", CONTEXT, "q") == "A real answer."
+
+
+def test_get_ai_response_error_is_not_cached(response_cache, monkeypatch):
+    monkeypatch.setattr(llm_interaction, "_generate_ai_response", lambda *args: ERROR_REPLY)
+    status = {}
+    assert llm_interaction.get_ai_response("q", CONTEXT, status=status) == ERROR_REPLY
+    assert status["complete"] is False
+    assert response_cache._cache["responses"] == {}
+
+    monkeypatch.setattr(llm_interaction, "_generate_ai_response", lambda *args: "A real answer.")
+    assert llm_interaction.get_ai_response("q", CONTEXT, status=status) == "A real answer."
+    assert status["complete"] is True
+    assert llm_interaction.get_ai_response("q", CONTEXT, status=status) == "A real answer." # Now from the cache
+    assert status["complete"] is True
+
+
+def test_stream_failing_midway_is_not_cached(response_cache, monkeypatch):
+    monkeypatch.setattr(llm_interaction, "model", object())
+    monkeypatch.setattr(llm_interaction, "_generate_with_backoff", lambda prompt, stream=False: _stream("Partial ", "answer", error=RuntimeError("connection reset")))
+    status = {}
+    reply = "".join(llm_interaction.stream_ai_response("q", CONTEXT, status=status))
+    assert reply == "Partial answer" + ERROR_REPLY
+    assert status["complete"] is False
+    assert response_cache._cache["responses"] == {}
+
+
+def test_stream_finished_cleanly_is_cached(response_cache, monkeypatch):
+    monkeypatch.setattr(llm_interaction, "model", object())
+    monkeypatch.setattr(llm_interaction, "_generate_with_backoff", lambda prompt, stream=False: _stream("Full ", "answer."))
+    status = {}
+    assert "".join(llm_interaction.stream_ai_response("q", CONTEXT, status=status)) == "Full answer."
+    assert status["complete"] is True
+    assert response_cache.lookup("general_assistant", CONTEXT, "q") == "Full answer."
+
+
+def test_insufficient_context_is_answered_locally_and_not_complete(response_cache):
+    status = {}
+    assert llm_interaction.get_ai_response("q", "", status=status) == llm_interaction.INSUFFICIENT_CONTEXT_RESPONSE
+    assert status["complete"] is False
+
+
+@pytest.fixture
+def semantic_cache(tmp_path, monkeypatch):
+    """src.semantic_cache, empty, saving under tmp_path and with a fixed log size."""
+    pytest.importorskip("numpy")
+    from src import semantic_cache
+    monkeypatch.setattr(semantic_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(semantic_cache, "CACHE_PATH", str(tmp_path / "semantic_cache.npz"))
+    state = {"loaded": True, "embeddings": None, "records": [], "dirty": False, "save_timer": None}
+    monkeypatch.setattr(semantic_cache, "_cache", state)
+    monkeypatch.setattr(semantic_cache.data_manager, "count_entries", lambda: 3)
+    yield semantic_cache
+    if state["save_timer"] is not None:
+        state["save_timer"].cancel()
+
+
+def test_semantic_cache_skips_error_replies(semantic_cache):
+    embedding = [1.0, 0.0, 0.0]
+    semantic_cache.store("q", "general_assistant", None, ERROR_REPLY, query_embedding=embedding)
+    assert semantic_cache.lookup("q", "general_assistant", query_embedding=embedding) is None
+    semantic_cache.store("q", "general_assistant", None, "A real answer.", query_embedding=embedding)
+    assert semantic_cache.lookup("q, rephrased", "general_assistant", query_embedding=[0.99, 0.05, 0.0]) == "A real answer."
+
+
+def test_semantic_cache_save_round_trip(semantic_cache):
+    semantic_cache.store("q", "general_assistant", {"entry_type": "emotion_log"}, "A real answer.", query_embedding=[0.0, 1.0, 0.0])
+    semantic_cache._save_if_dirty()
+    semantic_cache._cache.update(loaded=False, embeddings=None, records=[])
+    assert semantic_cache.lookup("q", "general_assistant", {"entry_type": "emotion_log"}, query_embedding=[0.0, 1.0, 0.0]) == "A real answer."
+    assert semantic_cache.lookup("q", "general_assistant", None, query_embedding=[0.0, 1.0, 0.0]) is None
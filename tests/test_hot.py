@@ -0,0 +1,62 @@
+# tests/test_hot.py
+import pytest
+
+from src import hot
+
+
+def _route_to_expert_baseline(user_query):
+    """The original if/elif router from app.py, kept as the reference for hot.route_to_expert."""
+    query_lower = user_query.lower()
+    if any(keyword in query_lower for keyword in ["academic", "study", "studies", "exam", "marks", "remedial", "os subject", "subject"]):
+        return "academic_advisor_expert"
+    elif any(keyword in query_lower for keyword in ["girlfriend", "relationship", "conflict with", "argument with"]):
+        return "relationship_counselor_expert"
+    elif any(keyword in query_lower for keyword in ["feel", "feeling", "emotion", "sad", "happy", "anxious", "stressed", "joyful", "disappointed"]):
+        return "emotion_reflection_expert"
+    elif any(keyword in query_lower for keyword in ["problem", "solve", "issue", "task", "how to", "strategy", "difficult", "time management", "balance"]):
+        return "problem_solving_expert"
+    elif any(keyword in query_lower for keyword in ["trip", "travel", "friends", "flatmates", "waterpark", "cricket", "hobby", "sport"]):
+        return "leisure_activity_expert"
+    else:
+        return "general_assistant"
+
+
+QUERIES = [
+    "",
+    "What did I do last week?",
+    "How do I prepare for the exam?",
+    "I feel sad about my marks", # emotion + academic: academic wins
+    "Argument with my girlfriend made me anxious", # relationship + emotion
+    "How to balance travel and studies", # problem + leisure + academic
+    "Trip with friends to the waterpark",
+    "I'm stressed, how to solve this task?",
+    "THE OS SUBJECT IS DIFFICULT",
+    "my hobby is cricket and it makes me happy",
+    "conflict within the team", # "conflict with" as a substring of "conflict within"
+    "passport", # "sport" inside another word, matched as a plain substring like before
+    "unfeeling", # overlapping keywords: "feel" and "feeling"
+    "relationships and time management",
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_route_to_expert_matches_baseline(query):
+    assert hot.route_to_expert(query) == _route_to_expert_baseline(query)
+
+
+def test_every_keyword_routes_to_its_expert_alone():
+    for expert, keywords in hot.ROUTER_KEYWORDS:
+        for keyword in keywords:
+            assert hot.route_to_expert(f"... {keyword} ...") == _route_to_expert_baseline(keyword) == expert
+
+
+def test_regex_fallback_matches_baseline(monkeypatch):
+    monkeypatch.setattr(hot, "ROUTER_AUTOMATON", None)
+    for query in QUERIES:
+        assert hot.route_to_expert(query) == _route_to_expert_baseline(query)
+
+
+def test_join_fallback_lines():
+    entries = [{"_fallback_line": "one"}, {"_fallback_line": "two"}]
+    assert hot.join_fallback_lines(entries) == "one\n\n---\n\ntwo"
+    assert hot.join_fallback_lines([]) == ""
@@ -0,0 +1,55 @@
+# tests/test_parse_due.py
+from datetime import datetime, timezone
+
+import pytest
+
+from src import assistant
+
+
+def _parse_due_baseline(due_str):
+    """The CLI's original due-date parsing: ISO when the input has a 'T', else YYYY-MM-DD HH:MM; naive means local time."""
+    if 'T' in due_str:
+        dt_obj_naive = datetime.fromisoformat(due_str)
+    else:
+        dt_obj_naive = datetime.strptime(due_str, "%Y-%m-%d %H:%M")
+    return dt_obj_naive.astimezone(None).astimezone(timezone.utc).isoformat()
+
+
+BASELINE_FORMATS = [
+    "2025-12-31 14:30",
+    "2025-01-05 09:05",
+    "2025-12-31T14:30",
+    "2025-12-31T14:30:00",
+    "2025-12-31T14:30:00.250000",
+    "2025-12-31T14:30:00Z",
+    "2025-12-31T14:30:00+00:00",
+    "2025-12-31T14:30:00+05:30",
+    "2025-12-31T14:30:00.5-08:00",
+]
+
+
+@pytest.mark.parametrize("due_str", BASELINE_FORMATS)
+def test_accepts_every_baseline_format(due_str):
+    assert assistant._parse_due(due_str) == _parse_due_baseline(due_str)
+
+
+def test_result_is_utc():
+    assert assistant._parse_due("2025-12-31T14:30:00+05:30") == "2025-12-31T09:00:00+00:00"
+    assert assistant._parse_due("2025-12-31T14:30:00Z") == "2025-12-31T14:30:00+00:00"
+
+
+def test_seconds_without_t():
+    assert assistant._parse_due("2025-12-31 14:30:15") == datetime(2025, 12, 31, 14, 30, 15).astimezone(timezone.utc).isoformat()
+
+
+def test_unparseable_returns_none(monkeypatch):
+    monkeypatch.setattr(assistant, "DATEPARSER_AVAILABLE", False)
+    assert assistant._parse_due("tomorrow 3pm") is None
+    assert assistant._parse_due("31/12/2025 14:30 and then some") is None
+
+
+def test_natural_language_with_dateparser():
+    pytest.importorskip("dateparser")
+    parsed = assistant._parse_due("in 2 hours")
+    assert parsed is not None
+    assert datetime.fromisoformat(parsed) > datetime.now(timezone.utc)
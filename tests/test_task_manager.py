@@ -0,0 +1,95 @@
+# tests/test_task_manager.py
+import json
+
+import pytest
+
+from src import task_manager
+
+
+@pytest.fixture
+def tasks_file(tmp_path, monkeypatch):
+    """Points task_manager at an empty tasks file under tmp_path, with fresh in-memory state."""
+    path = tmp_path / "tasks_data.jsonl"
+    monkeypatch.setattr(task_manager, "TASKS_DATA_FILE", str(path))
+    state = {"tasks": None, "by_id": {}, "active": {}, "file_key": None, "changed": {}, "record_count": 0, "flush_timer": None}
+    monkeypatch.setattr(task_manager, "_tasks_state", state)
+    yield path
+    if state["flush_timer"] is not None:
+        state["flush_timer"].cancel()
+
+
+def _reload_from_disk():
+    """Drops the in-memory state, as a fresh process would start."""
+    task_manager._tasks_state.update(tasks=None, by_id={}, active={}, file_key=None, changed={}, record_count=0)
+    return {task["task_id"]: task for task in task_manager.get_pending_tasks()}
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def test_op_log_replay_round_trip(tasks_file):
+    kept = task_manager.add_task("Write report", due_at_utc_str="2025-12-31T14:30:00Z", reminder_minutes_before=30)
+    dropped = task_manager.add_task("Call bank")
+    task_manager._flush_if_dirty()
+    task_manager.update_task(kept["task_id"], {"priority": "high"})
+    task_manager.delete_task(dropped["task_id"])
+    task_manager._flush_if_dirty()
+
+    ops = [record["op"] for record in _records(tasks_file)]
+    assert ops == ["upsert", "upsert", "upsert", "delete"]
+
+    tasks = _reload_from_disk()
+    assert list(tasks) == [kept["task_id"]]
+    task = tasks[kept["task_id"]]
+    assert task["priority"] == "high"
+    assert task["due_at_utc"] == "2025-12-31T14:30:00+00:00"
+    assert task["reminder_at_utc_list"] == ["2025-12-31T14:00:00+00:00"]
+    assert not any(key.startswith("_") for key in task)
+
+
+def test_replay_reads_plain_task_lines(tasks_file):
+    # What compaction (and the pre-op-log format) writes: one task per line
+    tasks_file.write_text(json.dumps({"task_id": "a", "title": "Plain", "status": "pending"}) + "\n"
+                          + json.dumps({"op": "upsert", "task": {"task_id": "a", "title": "Renamed", "status": "pending"}}) + "\n"
+                          + "not json\n", encoding="utf-8")
+    assert task_manager.get_task("a")["title"] == "Renamed"
+
+
+def test_burst_of_updates_is_one_record(tasks_file):
+    task = task_manager.add_task("Stretch")
+    for minutes in range(5):
+        task_manager.update_task(task["task_id"], {"description": f"{minutes} minutes"})
+    task_manager._flush_if_dirty()
+    assert len(_records(tasks_file)) == 1
+    assert _reload_from_disk()[task["task_id"]]["description"] == "4 minutes"
+
+
+def test_compaction_round_trip(tasks_file, monkeypatch):
+    monkeypatch.setattr(task_manager, "TASKS_COMPACT_MIN_RECORDS", 4)
+    first = task_manager.add_task("First")
+    second = task_manager.add_task("Second")
+    task_manager._flush_if_dirty()
+    for round_number in range(3):
+        task_manager.update_task(first["task_id"], {"description": f"round {round_number}"})
+        task_manager._flush_if_dirty()
+    task_manager.update_task(second["task_id"], {"status": "completed"})
+    task_manager._flush_if_dirty()
+
+    # The 5th record (for 2 tasks) crossed the ratio, so the log was rewritten as one plain line per task;
+    # the status change after it is appended to the compacted file as usual
+    records = _records(tasks_file)
+    assert [record.get("op") for record in records] == [None, None, "upsert"]
+    assert task_manager._tasks_state["record_count"] == 3
+
+    tasks = _reload_from_disk()
+    assert list(tasks) == [first["task_id"]]
+    assert tasks[first["task_id"]]["description"] == "round 2"
+    assert task_manager.get_task(second["task_id"])["status"] == "completed"
+
+
+def test_returned_tasks_carry_no_derived_fields(tasks_file):
+    task = task_manager.add_task("Due soon", due_at_utc_str="2000-01-01T00:00:00Z")
+    for returned in (task, task_manager.get_task(task["task_id"]), *task_manager.get_pending_tasks(),
+                     *task_manager.get_tasks_needing_reminders_or_due()):
+        assert not any(key.startswith("_") for key in returned)